@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-from backtest import Backtest
+from backtest import run_backtests, backtest_symbols
+from backtest_cache import BacktestCache
 import plotly.graph_objects as go
 from datetime import datetime
 
@@ -44,32 +45,39 @@ def main():
     st.set_page_config(page_title="期货回测系统", layout="wide")
     st.title("期货回测系统")
     
+    # 留空时回测信号表中的全部品种
+    symbols_text = st.text_input("回测品种（逗号分隔，留空为全部品种）", "")
+    
     # 添加回测按钮
     if st.button("开始回测"):
         with st.spinner("正在执行回测..."):
-            symbols = ['RU2505', 'MA2505', 'M2505']
+            symbols = backtest_symbols([s.strip() for s in symbols_text.split(',') if s.strip()])
+            if not symbols:
+                st.warning("信号表中没有可回测的品种")
+                return
             results = []
             
             # 创建进度条
             progress_bar = st.progress(0)
             
-            for i, symbol in enumerate(symbols):
-                # 执行回测
-                backtest = Backtest()
-                result = backtest.run(symbol)
+            def update_progress(done, total, symbol):
+                progress_bar.progress(done / total)
+            
+            # 并行执行回测，输入未变化的品种直接使用缓存
+            reports = run_backtests(symbols, progress_callback=update_progress, cache=BacktestCache())
+            for symbol, result in reports.items():
                 results.append({
                     'symbol': symbol,
                     'profit_pct': result['profit_pct'],
                     'total_trades': result['total_trades'],
                     'total_profit': result['total_profit'],
+                    'win_rate': result['win_rate'],
+                    'max_drawdown': result['max_drawdown'],
                     'trades': result['trades']
                 })
-                
-                # 更新进度条
-                progress_bar.progress((i + 1) / len(symbols))
             
             # 创建标签页
-            tabs = st.tabs(symbols)
+            tabs = st.tabs([r['symbol'] for r in results])
             
             # 在每个标签页中显示结果
             for tab, result in zip(tabs, results):
@@ -83,7 +91,7 @@ def main():
                     with col3:
                         st.metric("交易次数", result['total_trades'])
                     with col4:
-                        st.metric("平均收益", f"{result['total_profit']/result['total_trades']:,.2f}")
+                        st.metric("平均收益", f"{result['total_profit']/max(result['total_trades'], 1):,.2f}")
                     
                     # 显示交易图表
                     # st.plotly_chart(plot_trades(result['trades']), use_container_width=True)
@@ -99,7 +107,9 @@ def main():
                 '总收益': r['total_profit'],
                 '收益率': f"{r['profit_pct']:.2f}%",
                 '交易次数': r['total_trades'],
-                '平均收益': r['total_profit']/r['total_trades']
+                '平均收益': r['total_profit']/max(r['total_trades'], 1),
+                '胜率': f"{r['win_rate']:.2f}%",
+                '最大回撤': r['max_drawdown']
             } for r in results])
             st.dataframe(summary_df, use_container_width=True)
             
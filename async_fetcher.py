@@ -0,0 +1,169 @@
+import akshare as ak
+import asyncio
+import concurrent.futures
+import functools
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from bar_cache import bar_cache
+from rate_limit import TokenBucket
+
+# 新浪行情接口的限速：每秒请求数和允许的突发数
+SINA_RATE = 4
+SINA_BURST = 4
+# 本进程内所有新浪请求共用的令牌桶，异步获取和同步获取都从这里取令牌
+sina_limiter = TokenBucket(SINA_RATE, SINA_BURST)
+
+class DaemonThreadExecutor(concurrent.futures.Executor):
+    """工作线程为守护线程的线程池
+
+    ThreadPoolExecutor的线程在解释器退出时会被等待，akshare的请求没有超时，
+    一个卡住的请求会让程序过了截止时间也无法退出。守护线程在退出时直接放弃，
+    shutdown(wait=False)后卡住的请求不再阻塞任何人。
+    """
+
+    def __init__(self, max_workers=8, thread_name_prefix='fetch'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self.work = queue.SimpleQueue()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('线程池已关闭')
+            self.work.put((future, fn, args, kwargs))
+            if len(self.threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker, daemon=True,
+                                          name=f'{self.thread_name_prefix}_{len(self.threads)}')
+                thread.start()
+                self.threads.append(thread)
+        return future
+
+    def _worker(self):
+        while True:
+            item = self.work.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self.lock:
+            self.closed = True
+            threads = list(self.threads)
+        if cancel_futures:
+            while True:
+                try:
+                    item = self.work.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        for _ in threads:
+            self.work.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=8.0):
+    """带完全随机抖动的指数退避时间"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def download(symbol, period):
+    """请求一次新浪分钟数据"""
+    df = ak.futures_zh_minute_sina(symbol=symbol, period=period)
+    if df is not None and not df.empty:
+        df['timestamp'] = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return df
+
+async def fetch_minute_data(limiter, executor, symbol, period, max_retries=3):
+    """限速获取单个合约单个周期的K线，失败时指数退避重试
+
+    共享行情缓存中未过期的数据直接返回，不占用限速令牌。
+    """
+    loop = asyncio.get_running_loop()
+    df = await loop.run_in_executor(executor, bar_cache.cached, symbol, period)
+    if df is not None:
+        return df
+
+    for attempt in range(max_retries):
+        await limiter.acquire()
+        try:
+            # 经过缓存获取，其他程序正在获取同一数据时等待其结果
+            df = await loop.run_in_executor(
+                executor, bar_cache.get, symbol, period, functools.partial(download, symbol, period))
+            if df is not None and not df.empty:
+                return df
+            print(f"获取{symbol} {period}分钟数据为空，尝试重试 {attempt+1}/{max_retries}")
+        except Exception as e:
+            print(f"获取{symbol} {period}分钟数据失败: {e}，尝试重试 {attempt+1}/{max_retries}")
+
+        if attempt < max_retries - 1:
+            await asyncio.sleep(backoff_delay(attempt))
+
+    print(f"获取{symbol} {period}分钟数据失败，已达到最大重试次数")
+    return None
+
+async def fetch_cycle(symbols, periods=('5', '30'), limiter=None, deadline=45, max_concurrency=8, on_result=None):
+    """在截止时间内并发获取所有合约和周期的数据
+
+    limiter默认为进程共用的sina_limiter。每完成一个请求调用on_result(symbol, period, df)。返回本轮报告：
+    fetched为所有周期都成功的合约，failed为重试耗尽的合约，missed为
+    超过截止时间仍未完成的合约。
+    """
+    start = time.monotonic()
+    limiter = limiter or sina_limiter
+    executor = DaemonThreadExecutor(max_workers=max_concurrency)
+    tasks = {
+        asyncio.ensure_future(fetch_minute_data(limiter, executor, symbol, period)): (symbol, period)
+        for symbol in symbols for period in periods
+    }
+
+    failed, missed = set(), set()
+    try:
+        pending = set(tasks)
+        while pending:
+            remaining = deadline - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                symbol, period = tasks[task]
+                df = task.result()
+                if df is None:
+                    failed.add(symbol)
+                elif on_result is not None:
+                    try:
+                        on_result(symbol, period, df)
+                    except Exception as e:
+                        print(f"处理{symbol} {period}分钟数据时出错: {e}")
+                        failed.add(symbol)
+
+        for task in pending:
+            task.cancel()
+            missed.add(tasks[task][0])
+    finally:
+        # 不等待已超时的请求线程，结果直接丢弃；守护线程也不会在退出时被等待
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return {
+        'fetched': [symbol for symbol in symbols if symbol not in failed and symbol not in missed],
+        'failed': [symbol for symbol in symbols if symbol in failed and symbol not in missed],
+        'missed': [symbol for symbol in symbols if symbol in missed],
+        'elapsed': time.monotonic() - start
+    }
+
+def run_fetch_cycle(symbols, **kwargs):
+    """同步入口，执行一轮获取并返回报告"""
+    return asyncio.run(fetch_cycle(symbols, **kwargs))
@@ -0,0 +1,121 @@
+import sys
+import time
+import queue
+import threading
+from datetime import datetime
+
+QUEUE_SIZE = 10000
+# 行情汇总的输出间隔（秒）
+TICK_SUMMARY_SECONDS = 10
+
+class AsyncLogger:
+    """队列缓冲的日志，格式化和输出都在后台线程
+
+    log()只把 (时间, 格式串, 参数) 放入有界队列，不格式化、不阻塞；队列满时
+    丢弃并计数。tick()只累加每个合约的行情笔数和最新价，后台线程每
+    tick_interval秒输出一行汇总。计数由回调线程累加、后台线程取走，用
+    counter_lock保护，临界区只有几次字典操作。
+    """
+
+    def __init__(self, stream=None, maxsize=QUEUE_SIZE, tick_interval=TICK_SUMMARY_SECONDS):
+        self.stream = stream or sys.stdout
+        self.queue = queue.Queue(maxsize)
+        self.tick_interval = tick_interval
+        self.dropped = 0
+        self.tick_counts = {}  # symbol -> 本周期行情笔数
+        self.last_prices = {}  # symbol -> 最新价
+        self.counter_lock = threading.Lock()  # 保护dropped、tick_counts和last_prices
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def log(self, message, *args):
+        """记录一条日志，有args时在后台线程执行 message.format(*args)"""
+        if self.thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait((time.time(), message, args))
+        except queue.Full:
+            with self.counter_lock:
+                self.dropped += 1
+
+    def tick(self, symbol, price):
+        """记录一笔行情，只做计数"""
+        if self.thread is None:
+            self.start()
+        with self.counter_lock:
+            self.tick_counts[symbol] = self.tick_counts.get(symbol, 0) + 1
+            self.last_prices[symbol] = price
+
+    def _format(self, created, message, args):
+        text = message.format(*args) if args else message
+        return f"[{datetime.fromtimestamp(created)}] {text}\n"
+
+    def _tick_summary(self, elapsed):
+        with self.counter_lock:
+            counts, self.tick_counts = self.tick_counts, {}
+            prices = {symbol: self.last_prices.get(symbol) for symbol in counts}
+            dropped = self.dropped
+        if not counts:
+            return None
+        items = ' '.join(f"{symbol}:{count}笔/{prices[symbol]}" for symbol, count in sorted(counts.items()))
+        return (f"[{datetime.now()}] 行情汇总({elapsed:.0f}秒): 共{sum(counts.values())}笔 {items} "
+                f"日志队列:{self.queue.qsize()} 丢弃:{dropped}\n")
+
+    def _write(self, lines):
+        try:
+            self.stream.write(''.join(lines))
+            self.stream.flush()
+        except Exception:
+            pass
+
+    def _run(self):
+        last_summary = time.monotonic()
+        while True:
+            timeout = max(0.0, last_summary + self.tick_interval - time.monotonic())
+            lines = []
+            stop = False
+            try:
+                item = self.queue.get(timeout=timeout)
+                # 一次取完队列中的日志，合并成一次写入
+                while True:
+                    if item is None:
+                        stop = True
+                        break
+                    try:
+                        lines.append(self._format(*item))
+                    except Exception as e:
+                        lines.append(f"[{datetime.now()}] 日志格式化出错: {e} {item[1]!r}\n")
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if now - last_summary >= self.tick_interval or stop:
+                summary = self._tick_summary(now - last_summary)
+                if summary:
+                    lines.append(summary)
+                last_summary = now
+            if lines:
+                self._write(lines)
+            if stop:
+                return
+
+    def close(self, timeout=5):
+        """输出队列中剩余的日志并停止后台线程"""
+        if self.thread is None:
+            return
+        # 队列满时等待后台线程腾出位置再送达结束标记
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.thread = None
+
+logger = AsyncLogger()
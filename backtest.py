@@ -1,14 +1,24 @@
 import pandas as pd
+import numpy as np
 import os
+import argparse
 from datetime import datetime
-import glob
+import hashlib
+import concurrent.futures
+from trade_ledger import TradeLedger
+from backtest_cache import BacktestCache
+from bar_store import BarStore
+from signal_store import SignalStore
+
+bar_store = BarStore()
+signal_store = SignalStore()
 
 class Backtest:
     def __init__(self, initial_capital=100000):
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
         self.positions = {}  # {symbol: {'size': 1, 'entry_price': price, 'entry_time': time, 'take_profit': price}}
-        self.trades = []
+        self.trades = TradeLedger()
         
         # 设置每个品种的止盈点数和合约乘数
         self.take_profit_points = {
@@ -16,117 +26,118 @@ class Backtest:
             'RU2505': 5,  # 橡胶1个点=50元，对应5元价格变化
             'MA2505': 1  # 甲醇1个点=10元
         }
+        self.default_take_profit_point = 1  # 未单独设置止盈点数的品种
         self.contract_multiplier = 10  # 合约乘数
+        self.signal_timeframe = '5min'  # 使用哪个周期的信号表
         
+    def params(self):
+        """影响回测结果的策略参数"""
+        return {
+            'initial_capital': self.initial_capital,
+            'take_profit_points': self.take_profit_points,
+            'default_take_profit_point': self.default_take_profit_point,
+            'contract_multiplier': self.contract_multiplier,
+            'signal_timeframe': self.signal_timeframe
+        }
+    
+    def fingerprint(self, symbol, signals=None):
+        """回测输入数据（该品种的信号和1分钟K线文件）的内容哈希
+
+        signals为已读取的信号表，传入时不再重新读取。
+        """
+        digest = hashlib.sha256()
+        if signals is None:
+            signals = self.load_signals(symbol)
+        digest.update(pd.util.hash_pandas_object(signals, index=False).to_numpy().tobytes())
+        with open(bar_store.path(symbol, '1min'), 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
     def load_signals(self, symbol):
-        golden_cross = pd.read_csv(f'signals/{symbol}_golden_cross.csv')
-        death_cross = pd.read_csv(f'signals/{symbol}_death_cross.csv')
-        golden_cross['signal'] = 1  # 1 for buy
-        death_cross['signal'] = -1  # -1 for sell
-        
-        # 合并信号并按时间排序
-        all_signals = pd.concat([golden_cross, death_cross])
-        # 对每个时间点只保留第一个信号
-        all_signals = all_signals.drop_duplicates(subset=['datetime'], keep='first')
-        return all_signals.sort_values('datetime')
+        # 信号库按 (周期, 品种, 时间) 唯一，已按时间排序
+        all_signals = signal_store.signals(self.signal_timeframe, symbol)
+        # 1 for buy, -1 for sell
+        all_signals['signal'] = np.where(all_signals['signal_type'] == '金叉', 1, -1)
+        return all_signals.drop(columns=['signal_type', 'symbol'])
     
     def load_1min_data(self, symbol):
-        # Get the most recent 1min data file
-        files = glob.glob(f'data/1min/{symbol}_*.csv')
-        latest_file = max(files, key=os.path.getctime)
-        return pd.read_csv(latest_file)
+        return bar_store.load(symbol, '1min')
+    
+    def prepare_min_data(self):
+        """把1分钟K线转换为按时间排序的NumPy数组，供止盈查找使用"""
+        self.min_data['datetime'] = pd.to_datetime(self.min_data['datetime'])
+        self.min_data = self.min_data.sort_values('datetime', kind='stable').reset_index(drop=True)
+        self.min_times = self.min_data['datetime'].to_numpy(dtype='datetime64[ns]')
+        self.min_high = self.min_data['high'].to_numpy(dtype=float)
+        self.min_low = self.min_data['low'].to_numpy(dtype=float)
+        self.min_close = self.min_data['close'].to_numpy(dtype=float)
     
     def find_exit_price(self, symbol, entry_price, entry_time, signal_type):
-        # 获取入场后的所有K线
-        future_candles = self.min_data[self.min_data['datetime'] > entry_time]
-        take_profit_point = self.take_profit_points[symbol]
+        # 入场后第一根K线的位置
+        start = np.searchsorted(self.min_times, pd.Timestamp(entry_time).to_datetime64(), side='right')
+        if start >= len(self.min_times):
+            raise IndexError(f"{symbol} 在 {entry_time} 之后没有K线数据")
+        take_profit_point = self.take_profit_points.get(symbol, self.default_take_profit_point)
+        
+        if signal_type == 1:  # 买入
+            take_profit_price = entry_price + take_profit_point
+            hits = self.min_high[start:] >= take_profit_price
+        else:  # 卖出
+            take_profit_price = entry_price - take_profit_point
+            hits = self.min_low[start:] <= take_profit_price
         
-        for _, candle in future_candles.iterrows():
-            if signal_type == 1:  # 买入
-                if candle['high'] >= entry_price + take_profit_point:
-                    return candle['datetime'], entry_price + take_profit_point
-            else:  # 卖出
-                if candle['low'] <= entry_price - take_profit_point:
-                    return candle['datetime'], entry_price - take_profit_point
+        # 第一根触及止盈价的K线
+        first_hit = hits.argmax()
+        if hits[first_hit]:
+            return self.min_times[start + first_hit], take_profit_price
         
         # 如果没找到止盈点，使用最后一个K线
-        last_candle = future_candles.iloc[-1]
-        return last_candle['datetime'], last_candle['close']
+        return self.min_times[-1], self.min_close[-1]
     
     def execute_trade(self, symbol, signal_time, signal_price, signal_type):
         # Find the next 1min candle after the signal
-        next_candle = self.min_data[self.min_data['datetime'] > signal_time].iloc[0]
+        next_index = np.searchsorted(self.min_times, pd.Timestamp(signal_time).to_datetime64(), side='right')
+        next_candle = self.min_data.iloc[next_index]
         
-        if signal_type == 1:  # Golden cross - Buy
-            if symbol not in self.positions:
-                # Calculate position size (1 contract)
-                self.positions[symbol] = {
-                    'size': 1,
-                    'entry_price': next_candle['close'],
-                    'entry_time': next_candle['datetime']
-                }
-                self.trades.append({
-                    'symbol': symbol,
-                    'type': '买入',
-                    'entry_time': next_candle['datetime'],
-                    'entry_price': next_candle['close']
-                })
-                
-                # 寻找止盈点
-                exit_time, exit_price = self.find_exit_price(symbol, next_candle['close'], next_candle['datetime'], signal_type)
-                position = self.positions[symbol]
-                profit = (exit_price - position['entry_price']) * position['size'] * self.contract_multiplier
-                self.current_capital += profit
-                
-                self.trades.append({
-                    'symbol': symbol,
-                    'type': '卖出',
-                    'exit_time': exit_time,
-                    'exit_price': exit_price,
-                    'profit': profit
-                })
-                del self.positions[symbol]
-        else:  # Death cross - Sell
-            if symbol not in self.positions:
-                # Calculate position size (1 contract)
-                self.positions[symbol] = {
-                    'size': 1,
-                    'entry_price': next_candle['close'],
-                    'entry_time': next_candle['datetime']
-                }
-                self.trades.append({
-                    'symbol': symbol,
-                    'type': '卖出',
-                    'entry_time': next_candle['datetime'],
-                    'entry_price': next_candle['close']
-                })
-                
-                # 寻找止盈点
-                exit_time, exit_price = self.find_exit_price(symbol, next_candle['close'], next_candle['datetime'], signal_type)
-                position = self.positions[symbol]
-                profit = (position['entry_price'] - exit_price) * position['size'] * self.contract_multiplier
-                self.current_capital += profit
-                
-                self.trades.append({
-                    'symbol': symbol,
-                    'type': '买入',
-                    'exit_time': exit_time,
-                    'exit_price': exit_price,
-                    'profit': profit
-                })
-                del self.positions[symbol]
+        # 金叉买入，死叉卖出，每次1手
+        if symbol not in self.positions:
+            self.positions[symbol] = {
+                'size': 1,
+                'entry_price': next_candle['close'],
+                'entry_time': next_candle['datetime']
+            }
+            
+            # 寻找止盈点
+            exit_time, exit_price = self.find_exit_price(symbol, next_candle['close'], next_candle['datetime'], signal_type)
+            position = self.positions[symbol]
+            profit = (exit_price - position['entry_price']) * signal_type * position['size'] * self.contract_multiplier
+            self.current_capital += profit
+            
+            self.trades.append(symbol, signal_type, position['entry_time'], position['entry_price'],
+                               exit_time, exit_price, position['size'], profit)
+            del self.positions[symbol]
     
     def run(self, symbol):
-        signals = self.load_signals(symbol)
-        self.min_data = self.load_1min_data(symbol)
+        return self.run_signals(symbol, self.load_signals(symbol))
+    
+    def run_signals(self, symbol, signals, min_data=None):
+        """用给定的信号表（datetime, close, signal）回测
+
+        min_data为用于入场和止盈的K线，默认读取1分钟K线。
+        """
+        signals = signals.copy()
+        signals['datetime'] = pd.to_datetime(signals['datetime'])
+        self.min_data = self.load_1min_data(symbol) if min_data is None else min_data.copy()
+        self.prepare_min_data()
         
-        for _, row in signals.iterrows():
-            self.execute_trade(symbol, row['datetime'], row['close'], row['signal'])
+        for row in signals[['datetime', 'close', 'signal']].itertuples(index=False):
+            self.execute_trade(symbol, row.datetime, row.close, row.signal)
         
         return self.generate_report()
     
     def generate_report(self):
-        trades_df = pd.DataFrame(self.trades)
+        trades_df = self.trades.to_frame()
         total_profit = self.current_capital - self.initial_capital
         profit_pct = (total_profit / self.initial_capital) * 100
         
@@ -136,18 +147,95 @@ class Backtest:
             'total_profit': total_profit,
             'profit_pct': profit_pct,
             'total_trades': len(trades_df),
-            'trades': trades_df
+            'trades': trades_df,
+            **self.trades.stats(self.initial_capital)
         }
         return report
 
+def run_symbol_backtest(symbol, signals=None):
+    """在子进程中执行单个品种的回测，signals为主进程已读取的信号表"""
+    backtest = Backtest()
+    if signals is None:
+        return symbol, backtest.run(symbol)
+    return symbol, backtest.run_signals(symbol, signals)
+
+def backtest_symbols(symbols=None, timeframe='5min'):
+    """要回测的品种：指定时直接使用，否则取信号表中有信号且已存有1分钟K线的品种"""
+    if symbols:
+        return list(symbols)
+    stored = set(bar_store.symbols('1min'))
+    return [symbol for symbol in signal_store.symbols(timeframe) if symbol in stored]
+
+def run_backtests(symbols, max_workers=4, progress_callback=None, cache=None):
+    """使用进程池并行回测多个品种
+    
+    返回 {symbol: report}，按传入的品种顺序排列。每个品种完成时调用
+    progress_callback(已完成数量, 总数, symbol)。传入BacktestCache时，
+    输入未变化的品种直接返回缓存结果，只重新计算有变化的品种。
+    """
+    if not symbols:
+        return {}
+    
+    reports = {}
+    keys = {}
+    done = 0
+    
+    def report_progress(symbol):
+        nonlocal done
+        done += 1
+        if progress_callback is not None:
+            progress_callback(done, len(symbols), symbol)
+    
+    pending = list(symbols)
+    signals = {}
+    if cache is not None:
+        pending = []
+        for symbol in symbols:
+            try:
+                # 信号只读一次，计算缓存键和未命中时的回测共用
+                backtest = Backtest()
+                signals[symbol] = backtest.load_signals(symbol)
+                keys[symbol] = cache.key(backtest, symbol, signals[symbol])
+            except Exception as e:
+                print(f"计算 {symbol} 缓存键时出错: {e}")
+            cached = cache.get(keys[symbol]) if symbol in keys else None
+            if cached is not None:
+                reports[symbol] = cached
+                signals.pop(symbol, None)
+                report_progress(symbol)
+            else:
+                pending.append(symbol)
+    
+    if pending:
+        max_workers = max(1, min(max_workers, len(pending), os.cpu_count() or 1))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_symbol_backtest, symbol, signals.get(symbol)): symbol
+                       for symbol in pending}
+            for future in concurrent.futures.as_completed(futures):
+                symbol = futures[future]
+                try:
+                    _, reports[symbol] = future.result()
+                    if symbol in keys:
+                        cache.put(keys[symbol], reports[symbol])
+                except Exception as e:
+                    print(f"回测 {symbol} 时出错: {e}")
+                report_progress(symbol)
+    
+    return {symbol: reports[symbol] for symbol in symbols if symbol in reports}
+
 def main():
-    symbols = ['RU2505', 'MA2505', 'M2505']
+    parser = argparse.ArgumentParser(description='多品种回测')
+    parser.add_argument('--symbols', nargs='+', help='要回测的品种，默认为信号表中的全部品种')
+    parser.add_argument('--workers', type=int, default=4, help='并行回测的进程数')
+    args = parser.parse_args()
+    
+    symbols = backtest_symbols(args.symbols)
     results = []
     
-    for symbol in symbols:
-        print(f"\n开始回测 {symbol}...")
-        backtest = Backtest()
-        result = backtest.run(symbol)
+    print(f"\n开始回测 {symbols}...")
+    reports = run_backtests(symbols, max_workers=args.workers, cache=BacktestCache())
+    
+    for symbol, result in reports.items():
         results.append({
             'symbol': symbol,
             'profit_pct': result['profit_pct'],
@@ -160,6 +248,9 @@ def main():
         print(f"总收益: {result['total_profit']:,.2f}")
         print(f"收益率: {result['profit_pct']:.2f}%")
         print(f"总交易次数: {result['total_trades']}")
+        print(f"胜率: {result['win_rate']:.2f}%")
+        print(f"盈亏比: {result['profit_factor']:.2f}")
+        print(f"最大回撤: {result['max_drawdown']:,.2f}")
         
         # Save detailed trades to CSV
         result['trades'].to_csv(f'backtest_{symbol}_trades.csv', index=False)
@@ -0,0 +1,77 @@
+import os
+import json
+import pickle
+import hashlib
+
+CACHE_DIR = 'cache/backtest'
+# 回测逻辑或报告格式变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+class BacktestCache:
+    """按输入内容哈希缓存回测报告，超过容量上限时按最近使用时间淘汰"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def key(self, backtest, symbol, signals=None):
+        """由输入文件哈希和策略参数生成缓存键，signals为已读取的信号表"""
+        payload = json.dumps({
+            'version': CACHE_VERSION,
+            'symbol': symbol,
+            'inputs': backtest.fingerprint(symbol, signals),
+            'params': backtest.params()
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+
+    def get(self, key):
+        """读取缓存的报告，不存在返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                report = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        # 更新修改时间，作为LRU的访问时间
+        os.utime(path)
+        self.hits += 1
+        return report
+
+    def put(self, key, report):
+        """原子写入报告并按容量淘汰旧缓存"""
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(report, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """删除最久未使用的缓存，直到总大小不超过上限"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                total -= size
+            except OSError as e:
+                print(f"删除缓存 {name} 时出错: {e}")
@@ -0,0 +1,97 @@
+import pandas as pd
+import math
+from bar_resample import bar_labels
+
+BAR_PERIODS = (1, 5, 30)
+# 当前K线结束后等待几秒没有新tick也收盘
+CLOSE_GRACE_SECONDS = 2
+
+class BarBuilder:
+    """把行情tick聚合成1/5/30分钟K线（内存中，遵循交易时段）
+
+    K线时间为结束时间，切分规则与bar_resample.bar_labels一致（小节休息、午休
+    不单独成K线，开盘前集合竞价并入第一根）。tick的成交量为当日累计值，
+    K线成交量取相邻tick的差。下一根K线的第一个tick到达时上一根收盘；没有新
+    tick的合约由close_due按时间收盘。收盘时调用on_bar(symbol, minutes, bar)。
+    不加锁，在多个线程中使用时由调用方加锁。
+    """
+
+    def __init__(self, periods=BAR_PERIODS, on_bar=None, grace=CLOSE_GRACE_SECONDS):
+        self.periods = tuple(periods)
+        self.on_bar = on_bar
+        self.grace = pd.Timedelta(seconds=grace)
+        self.bars = {}         # (symbol, minutes) -> 正在形成的K线
+        self.last_volume = {}  # symbol -> 上一个tick的累计成交量
+        self.labels = {}       # tick所在分钟 -> 各周期K线结束时间
+
+    def _labels(self, minute):
+        labels = self.labels.get(minute)
+        if labels is None:
+            # 每分钟只计算一次，所有合约共用
+            minute_end = pd.Timestamp(minute) + pd.Timedelta(minutes=1)
+            labels = tuple(pd.Timestamp(bar_labels([minute_end], minutes)[0]) for minutes in self.periods)
+            if len(self.labels) > 1024:
+                self.labels.clear()
+            self.labels[minute] = labels
+        return labels
+
+    def _volume(self, symbol, volume):
+        last = self.last_volume.get(symbol)
+        self.last_volume[symbol] = volume
+        if last is None:
+            return 0.0
+        # 累计成交量变小说明进入了新交易日
+        return volume - last if volume >= last else volume
+
+    def update_tick(self, symbol, datetime, price, volume, hold=math.nan):
+        """输入一个tick，返回本次收盘的K线列表 [(minutes, bar)]"""
+        price = float(price)
+        traded = self._volume(symbol, float(volume))
+        # tick所在的分钟，datetime和pandas.Timestamp都支持replace
+        labels = self._labels(datetime.replace(second=0, microsecond=0))
+
+        closed = []
+        for minutes, label in zip(self.periods, labels):
+            key = (symbol, minutes)
+            bar = self.bars.get(key)
+            if bar is not None and label < bar['datetime']:
+                # 乱序的迟到tick，所属K线已收盘
+                continue
+            if bar is not None and label > bar['datetime']:
+                closed.append((minutes, self._close(symbol, minutes)))
+                bar = None
+            if bar is None:
+                self.bars[key] = {
+                    'datetime': label,
+                    'open': price,
+                    'high': price,
+                    'low': price,
+                    'close': price,
+                    'volume': traded,
+                    'hold': float(hold)
+                }
+            else:
+                if price > bar['high']:
+                    bar['high'] = price
+                if price < bar['low']:
+                    bar['low'] = price
+                bar['close'] = price
+                bar['volume'] += traded
+                bar['hold'] = float(hold)
+        return closed
+
+    def _close(self, symbol, minutes):
+        bar = self.bars.pop((symbol, minutes))
+        if self.on_bar is not None:
+            self.on_bar(symbol, minutes, bar)
+        return bar
+
+    def close_due(self, now=None):
+        """收盘结束时间已过的K线（品种没有新tick、收盘前最后一根等情况），返回 [(symbol, minutes, bar)]"""
+        now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+        due = [key for key, bar in self.bars.items() if bar['datetime'] + self.grace <= now]
+        return [(symbol, minutes, self._close(symbol, minutes)) for symbol, minutes in due]
+
+    def current(self, symbol, minutes):
+        """正在形成的K线，没有则返回None"""
+        return self.bars.get((symbol, minutes))
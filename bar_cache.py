@@ -0,0 +1,137 @@
+import pandas as pd
+import os
+import pickle
+import threading
+from bar_resample import bar_labels
+from file_lock import FileLock
+
+CACHE_DIR = 'cache/bars'
+# K线收盘后再等几秒，行情源更新完最后一根K线
+CLOSE_GRACE_SECONDS = 5
+# 等待其他进程获取同一数据的最长时间
+LOCK_TIMEOUT = 60
+
+def next_close(period, now=None):
+    """当前正在形成的period分钟K线的收盘时间（遵循交易时段）
+
+    非交易时间没有正在形成的K线，返回now之后一个周期。
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    minutes = int(period)
+    # 当前1分钟K线的结束时间
+    minute_end = now.floor('min') + pd.Timedelta(minutes=1)
+    close = pd.Timestamp(bar_labels([minute_end], minutes)[0])
+    if close < now:
+        close = now + pd.Timedelta(minutes=minutes)
+    return close
+
+class BarCache:
+    """多个进程共享的行情缓存，按 (品种, 周期) 存放最近一次获取的K线
+
+    缓存在当前K线收盘时过期，同一根K线内的重复请求直接读本地文件。
+    同一 (品种, 周期) 同时只有一个请求访问网络（进程内用线程锁，进程间用
+    文件锁），其他请求等待其完成后读取结果。
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, grace=CLOSE_GRACE_SECONDS, lock_timeout=LOCK_TIMEOUT):
+        self.cache_dir = cache_dir
+        self.grace = grace
+        self.lock_timeout = lock_timeout
+        self.hits = 0
+        self.misses = 0
+        self.locks = {}
+        self.locks_guard = threading.Lock()
+        self.counter_lock = threading.Lock()
+
+    def _path(self, symbol, period):
+        return os.path.join(self.cache_dir, str(period), f'{symbol}.pkl')
+
+    def _lock(self, symbol, period):
+        with self.locks_guard:
+            return self.locks.setdefault((symbol, str(period)), threading.Lock())
+
+    def _count(self, hit):
+        with self.counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def load(self, symbol, period):
+        """读取未过期的缓存，没有或已过期返回None"""
+        try:
+            with open(self._path(symbol, period), 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        # 过期时间为本地时间，与行情的K线时间一致
+        if pd.Timestamp.now() >= entry['expires']:
+            return None
+        return entry['data']
+
+    def cached(self, symbol, period):
+        """只读缓存不获取，命中时计入命中次数"""
+        df = self.load(symbol, period)
+        if df is not None:
+            self._count(True)
+        return df
+
+    def put(self, symbol, period, df):
+        """原子写入，有效期到当前K线收盘"""
+        path = self._path(symbol, period)
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        entry = {
+            'fetched': pd.Timestamp.now(),
+            'expires': next_close(period) + pd.Timedelta(seconds=self.grace),
+            'data': df
+        }
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def get(self, symbol, period, fetch):
+        """读取缓存，过期时调用fetch()获取并写入缓存
+
+        fetch返回None或空表时不写缓存，直接返回结果。
+        """
+        df = self.cached(symbol, period)
+        if df is not None:
+            return df
+
+        with self._lock(symbol, period):
+            lock = FileLock(f'{self._path(symbol, period)}.lock', timeout=self.lock_timeout)
+            try:
+                lock.acquire()
+            except TimeoutError as e:
+                print(f"{e}，直接获取 {symbol} {period}分钟数据")
+                self._count(False)
+                return fetch()
+            try:
+                return self._fetch_once(symbol, period, fetch)
+            finally:
+                lock.release()
+
+    def _fetch_once(self, symbol, period, fetch):
+        # 等锁期间其他线程或进程可能已经获取完成
+        df = self.cached(symbol, period)
+        if df is not None:
+            return df
+
+        self._count(False)
+        df = fetch()
+        if df is not None and not df.empty:
+            self.put(symbol, period, df)
+        return df
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else None
+        }
+
+bar_cache = BarCache()
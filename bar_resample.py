@@ -0,0 +1,83 @@
+import pandas as pd
+import numpy as np
+
+# 交易时段（分钟开始时间，分钟结束时间），以距当天0点的分钟数表示
+NIGHT_SESSIONS = [(21 * 60, 23 * 60)]
+DAY_SESSIONS = [(9 * 60, 10 * 60 + 15), (10 * 60 + 30, 11 * 60 + 30), (13 * 60 + 30, 15 * 60)]
+
+NIGHT_START = 21 * 60
+DAY_START = 9 * 60
+DAY_LENGTH = sum(end - start for start, end in DAY_SESSIONS)  # 日盘共225个交易分钟
+# 开盘前集合竞价产生的K线并入第一根K线
+AUCTION_MINUTES = 10
+
+def day_offset_to_clock(offsets):
+    """日盘交易分钟序号转换为时钟分钟（跳过小节休息和午休）"""
+    offsets = np.asarray(offsets)
+    clock = np.zeros(offsets.shape, dtype=np.int64)
+    elapsed = 0
+    for i, (start, end) in enumerate(DAY_SESSIONS):
+        length = end - start
+        in_session = (offsets >= elapsed) & (offsets <= elapsed + length) if i == 0 else \
+            (offsets > elapsed) & (offsets <= elapsed + length)
+        clock = np.where(in_session, start + offsets - elapsed, clock)
+        elapsed += length
+    return clock
+
+def clock_to_day_offset(minutes):
+    """日盘时钟分钟转换为交易分钟序号，休息时段归入前一个交易分钟"""
+    minutes = np.asarray(minutes)
+    offsets = np.zeros(minutes.shape, dtype=np.int64)
+    elapsed = 0
+    for start, end in DAY_SESSIONS:
+        offsets = np.where(minutes >= start, np.minimum(minutes - start, end - start - 1) + elapsed, offsets)
+        elapsed += end - start
+    return offsets
+
+def bar_labels(times, minutes):
+    """计算每根1分钟K线所属的N分钟K线的结束时间
+
+    K线时间为结束时间（与新浪行情一致）。日盘按交易分钟计数切分，跨小节休息
+    和午休的K线在休息后继续计数，最后一根在15:00收盘；夜盘从21:00起计数，
+    可跨越0点。
+    """
+    times = pd.to_datetime(pd.Series(times)).to_numpy(dtype='datetime64[m]')
+    # K线开始时间所在的分钟
+    start = times - np.timedelta64(1, 'm')
+    day = start.astype('datetime64[D]')
+    clock = (start - day).astype(np.int64)
+
+    is_day = (clock >= DAY_START - AUCTION_MINUTES) & (clock < NIGHT_START - AUCTION_MINUTES)
+    # 夜盘以前一晚21:00为起点，0点之后的K线属于前一天的夜盘
+    night_anchor = np.where(clock >= DAY_START, day, day - np.timedelta64(1, 'D'))
+    night_offset = np.where(clock >= DAY_START, clock - NIGHT_START, clock + 24 * 60 - NIGHT_START)
+    night_offset = np.maximum(night_offset, 0)
+    night_label = night_anchor + (NIGHT_START + (night_offset // minutes + 1) * minutes).astype('timedelta64[m]')
+
+    day_offset = clock_to_day_offset(np.maximum(clock, DAY_START))
+    day_end = np.minimum((day_offset // minutes + 1) * minutes, DAY_LENGTH)
+    day_label = day + day_offset_to_clock(day_end).astype('timedelta64[m]')
+
+    return np.where(is_day, day_label, night_label).astype('datetime64[ns]')
+
+def resample_bars(df, minutes):
+    """把按时间排序的1分钟K线合成为N分钟K线，遵循期货交易时段"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=['datetime', 'open', 'high', 'low', 'close', 'volume', 'hold'])
+
+    df = df.sort_values('datetime', kind='stable')
+    labels = bar_labels(df['datetime'], minutes)
+    starts = np.flatnonzero(np.append(True, labels[1:] != labels[:-1]))
+    ends = np.append(starts[1:], len(labels)) - 1
+
+    bars = pd.DataFrame({
+        'datetime': labels[starts],
+        'open': df['open'].to_numpy(dtype=float)[starts],
+        'high': np.maximum.reduceat(df['high'].to_numpy(dtype=float), starts),
+        'low': np.minimum.reduceat(df['low'].to_numpy(dtype=float), starts),
+        'close': df['close'].to_numpy(dtype=float)[ends],
+        'volume': np.add.reduceat(df['volume'].to_numpy(dtype=float), starts),
+    })
+    if 'hold' in df.columns:
+        bars['hold'] = df['hold'].to_numpy(dtype=float)[ends]
+    return bars
@@ -0,0 +1,134 @@
+import pandas as pd
+import numpy as np
+import os
+from file_lock import FileLock
+
+STORE_DIR = 'data/store'
+
+# 定长记录，datetime为纳秒时间戳
+RECORD = np.dtype([
+    ('datetime', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+    ('hold', np.float64),
+])
+PRICE_COLUMNS = [name for name in RECORD.names if name != 'datetime']
+
+class BarStore:
+    """按品种和周期存储K线的追加式列存文件
+
+    每个 (周期, 品种) 对应一个定长记录的二进制文件，按datetime递增追加。
+    写入时只合并新K线，并覆盖最后一根（可能未走完的）K线；读取时用
+    memmap加二分查找定位时间区间，无需解析整个文件。多个进程写同一文件时
+    用旁边的 .lock 文件加锁，读取时在锁内复制数据，不会读到写了一半的K线。
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, timeframe, f'{symbol}.bin')
+
+    def lock(self, symbol, timeframe):
+        return FileLock(f'{self.path(symbol, timeframe)}.lock')
+
+    def symbols(self, timeframe):
+        """列出某个周期下已存储的品种"""
+        directory = os.path.join(self.root, timeframe)
+        if not os.path.exists(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.bin'))
+
+    def _open(self, symbol, timeframe):
+        """以只读memmap打开，文件末尾不完整的记录会被忽略"""
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(path):
+            return None
+        count = os.path.getsize(path) // RECORD.itemsize
+        if count == 0:
+            return None
+        return np.memmap(path, dtype=RECORD, mode='r', shape=(count,))
+
+    def count(self, symbol, timeframe):
+        records = self._open(symbol, timeframe)
+        return 0 if records is None else len(records)
+
+    def last_datetime(self, symbol, timeframe):
+        """最后一根K线的时间，没有数据返回None"""
+        records = self._open(symbol, timeframe)
+        if records is None:
+            return None
+        return pd.Timestamp(int(records['datetime'][-1]))
+
+    def append(self, symbol, timeframe, df):
+        """合并新K线，返回新增的K线数量
+
+        早于已存最后一根的K线视为已存在；与最后一根时间相同的K线覆盖写入。
+        """
+        if df is None or df.empty:
+            return 0
+
+        incoming = np.zeros(len(df), dtype=RECORD)
+        incoming['datetime'] = pd.to_datetime(df['datetime']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        for name in PRICE_COLUMNS:
+            if name in df.columns:
+                incoming[name] = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+
+        # 按时间排序，同一时间保留最后一条
+        incoming = incoming[np.argsort(incoming['datetime'], kind='stable')]
+        keep = np.append(incoming['datetime'][1:] != incoming['datetime'][:-1], True)
+        incoming = incoming[keep]
+
+        path = self.path(symbol, timeframe)
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self.lock(symbol, timeframe):
+            # 读取已有记录数和写入都在锁内，避免多个进程互相截断刚写入的K线
+            records = self._open(symbol, timeframe)
+            count = 0 if records is None else len(records)
+            if count:
+                last = records['datetime'][-1]
+                incoming = incoming[incoming['datetime'] >= last]
+                del records
+
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                # 丢弃上次写入中断留下的半条记录
+                f.truncate(count * RECORD.itemsize)
+                new_bars = len(incoming)
+                if count and len(incoming) and incoming['datetime'][0] == last:
+                    f.seek((count - 1) * RECORD.itemsize)
+                    new_bars -= 1
+                else:
+                    f.seek(count * RECORD.itemsize)
+                f.write(incoming.tobytes())
+        return new_bars
+
+    def load(self, symbol, timeframe, start=None, end=None, tail=None):
+        """读取 [start, end] 区间的K线，tail指定时只取最后tail根"""
+        if not os.path.exists(self.path(symbol, timeframe)):
+            return pd.DataFrame(columns=list(RECORD.names))
+        with self.lock(symbol, timeframe):
+            records = self._open(symbol, timeframe)
+            if records is None:
+                return pd.DataFrame(columns=list(RECORD.names))
+
+            times = records['datetime']
+            lo, hi = 0, len(records)
+            if start is not None:
+                lo = np.searchsorted(times, pd.Timestamp(start).value, side='left')
+            if end is not None:
+                hi = np.searchsorted(times, pd.Timestamp(end).value, side='right')
+            if tail is not None:
+                lo = max(lo, hi - tail)
+
+            # 在锁内复制，最后一根K线可能正被覆盖写入
+            selected = np.array(records[lo:hi])
+            del records, times
+        df = pd.DataFrame({name: selected[name] for name in PRICE_COLUMNS})
+        df.insert(0, 'datetime', selected['datetime'].view('datetime64[ns]'))
+        return df
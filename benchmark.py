@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import subprocess
+import tracemalloc
+import contextlib
+from datetime import datetime
+from synthetic_data import generate_bars
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+HISTORY_FILE = 'benchmark_history.json'
+NUM_SYMBOLS = 32
+
+def split_symbols(df, count=NUM_SYMBOLS):
+    """把一段K线切分成多个模拟合约"""
+    chunks = np.array_split(np.arange(len(df)), count)
+    return {f'SYM{i:02d}': df.iloc[chunk].reset_index(drop=True) for i, chunk in enumerate(chunks) if len(chunk)}
+
+def setup_calculate_ema_signals(rows):
+    from calculate_signals import calculate_ema_signals
+    df = generate_bars(rows, minutes=5)
+    return lambda: calculate_ema_signals(df.copy())
+
+def setup_calculate_ema_signals_batch(rows):
+    from calculate_signals import calculate_ema_signals_batch
+    frames = split_symbols(generate_bars(rows, minutes=5))
+    return lambda: calculate_ema_signals_batch(frames)
+
+def setup_backtest_run(rows):
+    from backtest import Backtest
+    from calculate_signals import calculate_ema_signals
+
+    min_data = generate_bars(rows, minutes=1)
+    bars = generate_bars(max(rows // 5, 30), minutes=5)
+    golden, death, _, _ = calculate_ema_signals(bars)
+    golden = golden[['datetime', 'close']].assign(signal=1)
+    death = death[['datetime', 'close']].assign(signal=-1)
+    signals = pd.concat([golden, death]).sort_values('datetime')
+    # 最后一根K线之后的信号无法入场
+    signals = signals[signals['datetime'] < min_data['datetime'].iloc[-2]]
+
+    def run():
+        backtest = Backtest()
+        backtest.take_profit_points['SYM00'] = 5
+        backtest.load_signals = lambda symbol: signals
+        backtest.load_1min_data = lambda symbol: min_data.copy()
+        return backtest.run('SYM00')
+    return run
+
+def setup_aggregate_signals(rows):
+    from calculate_signals import calculate_ema_signals, signal_table, write_signal_table
+
+    workdir = tempfile.mkdtemp(prefix='bench_signals_')
+    frames = split_symbols(generate_bars(rows, minutes=5))
+    computed = {symbol: calculate_ema_signals(df) for symbol, df in frames.items()}
+
+    def run():
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            write_signal_table(signal_table(computed), '5min')
+        finally:
+            os.chdir(cwd)
+    return run
+
+def setup_predict_cross_signals(rows):
+    from live_monitor import predict_cross_signals
+    frames = split_symbols(generate_bars(rows, minutes=5))
+    return lambda: predict_cross_signals({symbol: df.copy() for symbol, df in frames.items()})
+
+STAGES = {
+    'calculate_ema_signals': setup_calculate_ema_signals,
+    'calculate_ema_signals_batch': setup_calculate_ema_signals_batch,
+    'backtest_run': setup_backtest_run,
+    'aggregate_signals': setup_aggregate_signals,
+    'predict_cross_signals': setup_predict_cross_signals,
+}
+
+def quiet(run):
+    """运行时屏蔽被测函数的打印输出"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return run()
+
+def measure(run, repeat=3, memory=True):
+    """返回最短耗时（秒）和峰值内存（MB）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        quiet(run)
+        timings.append(time.perf_counter() - start)
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            quiet(run)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_mb = peak / 1024 / 1024
+    return min(timings), peak_mb
+
+def run_stage(name, rows, repeat=3, memory=True):
+    """执行单个阶段的基准测试"""
+    try:
+        run = quiet(lambda: STAGES[name](rows))
+    except ImportError as e:
+        return {'stage': name, 'rows': rows, 'skipped': f'缺少依赖: {e}'}
+
+    seconds, peak_mb = measure(run, repeat, memory)
+    return {
+        'stage': name,
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else None,
+        'peak_mb': peak_mb
+    }
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception:
+        return None
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_history(path, history):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def previous_result(history, stage, rows):
+    """查找历史记录中同一阶段同一规模的最近一次结果"""
+    for run in reversed(history):
+        for result in run['results']:
+            if result['stage'] == stage and result['rows'] == rows and 'seconds' in result:
+                return result
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description='离线性能基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='数据行数，最大可到10000000')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='不统计峰值内存（大数据量时更快）')
+    parser.add_argument('--output', default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    history = load_history(args.output)
+    results = []
+
+    for stage in args.stages:
+        for rows in args.sizes:
+            result = run_stage(stage, rows, args.repeat, not args.no_memory)
+            results.append(result)
+            if 'skipped' in result:
+                print(f"{stage:<28} {rows:>10,} 跳过: {result['skipped']}")
+                continue
+
+            line = f"{stage:<28} {rows:>10,} {result['seconds']:>10.4f}s {result['rows_per_sec']:>14,.0f} 行/秒"
+            if result['peak_mb'] is not None:
+                line += f" {result['peak_mb']:>9.1f} MB"
+            previous = previous_result(history, stage, rows)
+            if previous:
+                line += f"  (上次的 {result['seconds'] / previous['seconds']:.2f} 倍)"
+            print(line)
+
+    history.append({
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results
+    })
+    save_history(args.output, history)
+    print(f"结果已保存到: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,40 @@ import pandas as pd
 import numpy as np
 import talib
 import os
+import argparse
+import concurrent.futures
 from datetime import datetime
+from bar_store import BarStore
+from signal_store import SignalStore
+from indicators import with_indicators
 
-def calculate_ema_signals(df):
-    """计算EMA8和EMA21，并生成金叉死叉信号"""
-    # 计算EMA
-    df['EMA8'] = talib.EMA(df['close'], timeperiod=8)
-    df['EMA21'] = talib.EMA(df['close'], timeperiod=21)
-    
-    # 计算斜率（使用3个点的移动平均来平滑）
-    df['EMA8_slope'] = df['EMA8'].diff(3) / 3
-    df['EMA21_slope'] = df['EMA21'].diff(3) / 3
-    
-    # 计算角度（弧度）
-    df['angle'] = np.arctan2(df['EMA8_slope'] - df['EMA21_slope'], 1)
-    # 转换为角度
-    df['angle_degrees'] = np.degrees(df['angle'])
-    
-    # 计算金叉死叉
-    df['cross'] = np.where(df['EMA8'] > df['EMA21'], 1, -1)
-    df['cross_change'] = df['cross'].diff()
+bar_store = BarStore()
+signal_store = SignalStore()
+
+TIMEFRAMES = ['30min', '5min']
+SIGNALS_DIR = 'signals'
+SIGNAL_COLUMNS = ['datetime', 'close', 'EMA8', 'EMA21', 'angle_degrees']
+SIGNAL_TYPES = ['金叉', '死叉']
+TABLE_COLUMNS = SIGNAL_COLUMNS + ['signal_type', 'symbol']
+# 子进程返回的信号记录，datetime为纳秒时间戳
+SIGNAL_RECORD = np.dtype([
+    ('datetime', np.int64),
+    ('close', np.float64),
+    ('EMA8', np.float64),
+    ('EMA21', np.float64),
+    ('angle_degrees', np.float64),
+])
+
+# calculate_ema_signals附加的指标列
+SIGNAL_INDICATORS = ['EMA8', 'EMA21', 'EMA8_slope', 'EMA21_slope', 'angle', 'angle_degrees', 'cross', 'cross_change']
+
+def calculate_ema_signals(df, symbol=None, timeframe=None):
+    """计算EMA8和EMA21，并生成金叉死叉信号
+
+    指标由indicators模块计算，给出symbol和timeframe时同一进程内同一份数据只计算一次。
+    不修改传入的DataFrame。
+    """
+    df = with_indicators(df, SIGNAL_INDICATORS, symbol, timeframe)
     
     # 获取当前日期
     current_date = datetime.now().date()
@@ -36,197 +50,292 @@ def calculate_ema_signals(df):
     
     return golden_cross, death_cross, golden_cross_today, death_cross_today
 
-def save_signals(golden_cross, death_cross, golden_cross_today, death_cross_today, symbol, timeframe='30min'):
-    """保存金叉死叉信号到CSV文件"""
-    # 如果当天没有信号，直接返回
-    if golden_cross.empty and death_cross.empty:
-        print(f"合约 {symbol} 没有信号")
-        return
-        
-    signals_dir = f'signals/{timeframe}'
-    if not os.path.exists(signals_dir):
-        os.makedirs(signals_dir)
-    
-    # 保存金叉信号
-    if not golden_cross.empty:
-        golden_filename = f"{signals_dir}/{symbol}_golden_cross.csv"
-        golden_cross[['datetime', 'close', 'EMA8', 'EMA21', 'angle_degrees']].to_csv(golden_filename, index=False, encoding='utf-8-sig')
-        print(f"金叉信号已保存到: {golden_filename}")
-    
-    # 保存死叉信号
-    if not death_cross.empty:
-        death_filename = f"{signals_dir}/{symbol}_death_cross.csv"
-        death_cross[['datetime', 'close', 'EMA8', 'EMA21', 'angle_degrees']].to_csv(death_filename, index=False, encoding='utf-8-sig')
-        print(f"死叉信号已保存到: {death_filename}")
-
-    # 保存当天金叉信号
-    if not golden_cross_today.empty:
-        golden_filename_today = f"{signals_dir}/{symbol}_golden_cross_today.csv"
-        golden_cross_today[['datetime', 'close', 'EMA8', 'EMA21', 'angle_degrees']].to_csv(golden_filename_today, index=False, encoding='utf-8-sig')
-        print(f"当天金叉信号已保存到: {golden_filename_today}")
-    
-    # 保存当天死叉信号
-    if not death_cross_today.empty:
-        death_filename_today = f"{signals_dir}/{symbol}_death_cross_today.csv"
-        death_cross_today[['datetime', 'close', 'EMA8', 'EMA21', 'angle_degrees']].to_csv(death_filename_today, index=False, encoding='utf-8-sig')
-        print(f"当天死叉信号已保存到: {death_filename_today}")
-
-def process_file(file_path, timeframe='30min'):
-    """处理单个CSV文件"""
+def ema_columns(values, period):
+    """对二维数组按列计算EMA
+
+    递推本身在TA-Lib的C代码中逐列完成，保证与calculate_ema_signals逐位一致
+    （TA-Lib的递推在部分平台上被编译为融合乘加，numpy无法复现）。按时间逐行
+    用numpy同时递推所有列比逐列调用TA-Lib慢3到6倍（32列、1千到10万行实测）。
+    """
+    ema = np.empty(values.shape)
+    for j in range(values.shape[1]):
+        ema[:, j] = talib.EMA(values[:, j], timeperiod=period)
+    return ema
+
+def calculate_ema_signals_batch(frames):
+    """批量计算多个合约的EMA8/EMA21金叉死叉信号
+
+    frames为 {symbol: K线DataFrame}。所有合约按K线序号对齐成 时间×合约 的
+    二维数组，EMA、斜率、角度和交叉变化各做一次向量化计算，再拆回每个合约。
+    返回 {symbol: (golden_cross, death_cross, golden_cross_today, death_cross_today)}，
+    与逐个调用calculate_ema_signals的结果一致。
+    """
+    symbols = [symbol for symbol, df in frames.items() if not df.empty]
+    results = {symbol: calculate_ema_signals(df.copy()) for symbol, df in frames.items() if df.empty}
+    if not symbols:
+        return results
+
+    # 按K线序号左对齐，较短的合约在末尾用NaN填充，不影响前面的计算
+    lengths = np.array([len(frames[symbol]) for symbol in symbols])
+    close = np.full((lengths.max(), len(symbols)), np.nan)
+    for j, symbol in enumerate(symbols):
+        close[:lengths[j], j] = frames[symbol]['close'].to_numpy(dtype=float)
+
+    ema8 = ema_columns(close, 8)
+    ema21 = ema_columns(close, 21)
+
+    # 斜率、角度、交叉变化，与calculate_ema_signals中的pandas计算相同
+    ema8_slope = np.full(close.shape, np.nan)
+    ema21_slope = np.full(close.shape, np.nan)
+    ema8_slope[3:] = (ema8[3:] - ema8[:-3]) / 3
+    ema21_slope[3:] = (ema21[3:] - ema21[:-3]) / 3
+    angle = np.arctan2(ema8_slope - ema21_slope, 1)
+    angle_degrees = np.degrees(angle)
+    cross = np.where(ema8 > ema21, 1, -1)
+    cross_change = np.full(close.shape, np.nan)
+    cross_change[1:] = np.diff(cross, axis=0)
+
+    golden_mask = (cross_change == 2) & (angle_degrees > 15)
+    death_mask = (cross_change == -2) & (angle_degrees < -15)
+
+    columns = {
+        'EMA8': ema8, 'EMA21': ema21,
+        'EMA8_slope': ema8_slope, 'EMA21_slope': ema21_slope,
+        'angle': angle, 'angle_degrees': angle_degrees,
+        'cross': cross, 'cross_change': cross_change
+    }
+
+    for j, symbol in enumerate(symbols):
+        df = frames[symbol]
+        n = lengths[j]
+        arrays = {name: df[name].to_numpy() for name in df.columns}
+        tables = []
+        for mask in (golden_mask, death_mask):
+            rows = np.flatnonzero(mask[:n, j])
+            data = {name: values[rows] for name, values in arrays.items()}
+            data.update({name: values[rows, j] for name, values in columns.items()})
+            tables.append(pd.DataFrame(data, index=df.index[rows]))
+        golden_cross, death_cross = tables
+        results[symbol] = (golden_cross, death_cross, today_view(golden_cross), today_view(death_cross))
+
+    return {symbol: results[symbol] for symbol in frames}
+
+def process_bars(df, symbol, timeframe='30min'):
+    """处理单个合约的K线数据，返回信号，出错时返回None"""
     try:
-        # 读取数据
-        df = pd.read_csv(file_path)
-        
         # 确保datetime列是datetime类型
         df['datetime'] = pd.to_datetime(df['datetime'])
         
-        # 获取合约代码
-        symbol = os.path.basename(file_path).split('_')[0]
         print(f"\n处理合约: {symbol}")
         
         # 计算信号
-        golden_cross, death_cross, golden_cross_today, death_cross_today = calculate_ema_signals(df)
-        
-        # 保存信号
-        save_signals(golden_cross, death_cross, golden_cross_today, death_cross_today, symbol, timeframe)
-        
-        # 打印统计信息
-        print(f"金叉次数: {len(golden_cross)}")
-        print(f"死叉次数: {len(death_cross)}")
-        print(f"当天金叉次数: {len(golden_cross_today)}")
-        print(f"当天死叉次数: {len(death_cross_today)}")
+        signals = calculate_ema_signals(df, symbol, timeframe)
+        report_signals(signals, symbol, timeframe)
+        return signals
 
     except Exception as e:
-        print(f"处理文件 {file_path} 时出错: {e}")
+        print(f"处理合约 {symbol} 时出错: {e}")
+        return None
 
-def aggregate_signals(timeframe='30min'):
-    """汇总所有合约当天的信号到一个CSV文件"""
-    signals_dir = f'signals/{timeframe}'
-    if not os.path.exists(signals_dir):
-        print("没有找到信号文件")
-        return
-        
-    # 获取所有信号文件
-    golden_files = [f for f in os.listdir(signals_dir) if f.endswith('_golden_cross.csv')]
-    death_files = [f for f in os.listdir(signals_dir) if f.endswith('_death_cross.csv')]
-    golden_files_today = [f for f in os.listdir(signals_dir) if f.endswith('_golden_cross_today.csv')]
-    death_files_today = [f for f in os.listdir(signals_dir) if f.endswith('_death_cross_today.csv')]
-    
-    all_signals = []
-    all_signals_today = []
-
-    # 读取金叉信号
-    for file in golden_files:
-        symbol = file.split('_')[0]
-        df = pd.read_csv(f'{signals_dir}/{file}')
-        df['signal_type'] = '金叉'
-        df['symbol'] = symbol
-        all_signals.append(df)
-    
-    # 读取死叉信号
-    for file in death_files:
-        symbol = file.split('_')[0]
-        df = pd.read_csv(f'{signals_dir}/{file}')
-        df['signal_type'] = '死叉'
-        df['symbol'] = symbol
-        all_signals.append(df)
-    
-    # 读取当天金叉信号
-    for file in golden_files_today:
-        symbol = file.split('_')[0]
-        df = pd.read_csv(f'{signals_dir}/{file}')
-        df['signal_type'] = '金叉'
-        df['symbol'] = symbol
-        all_signals_today.append(df)
-    
-    # 读取当天死叉信号
-    for file in death_files_today:
-        symbol = file.split('_')[0]
-        df = pd.read_csv(f'{signals_dir}/{file}')
-        df['signal_type'] = '死叉'
-        df['symbol'] = symbol
-        all_signals_today.append(df)
-    
-    if not all_signals:
-        print("没有找到任何信号")
-        return
-        
-    # 合并所有信号
-    combined_signals = pd.concat(all_signals, ignore_index=True)
-    
-    # 确保datetime列是datetime类型
-    combined_signals['datetime'] = pd.to_datetime(combined_signals['datetime'])
-    
-    # 按时间倒序排序
-    combined_signals = combined_signals.sort_values('datetime', ascending=False)
-    
-    # 保存汇总文件
-    combined_signals.to_csv(f'{signals_dir}/all_signals.csv', index=False, encoding='utf-8-sig')
-    
-    print(f"已保存汇总信号到: {signals_dir}/all_signals.csv")
-    print(f"共 {len(combined_signals)} 个信号")
-
-    if all_signals_today:
-        combined_signals_today = pd.concat(all_signals_today, ignore_index=True)
-        combined_signals_today['datetime'] = pd.to_datetime(combined_signals_today['datetime'])
-        combined_signals_today = combined_signals_today.sort_values('datetime', ascending=False)
-        combined_signals_today.to_csv(f'{signals_dir}/all_signals_today.csv', index=False, encoding='utf-8-sig')
-        print(f"已保存汇总信号到: {signals_dir}/all_signals_today.csv")
-        print(f"共 {len(combined_signals_today)} 个信号")
-    
-    # 删除单个合约的信号文件
-    for file in golden_files + death_files:
-        try:
-            os.remove(f'{signals_dir}/{file}')
-            print(f"已删除: {signals_dir}/{file}")
-        except Exception as e:
-            print(f"删除文件 {signals_dir}/{file} 时出错: {e}")
-
-def process_timeframe(timeframe):
-    """处理指定时间周期的数据"""
-    data_dir = f'data/{timeframe}'
-    signals_dir = f'signals/{timeframe}'
-    
-    if not os.path.exists(data_dir):
-        print(f"错误: {data_dir} 目录不存在")
+def report_signals(signals, symbol, timeframe='30min'):
+    """打印单个合约的信号统计信息"""
+    golden_cross, death_cross, golden_cross_today, death_cross_today = signals
+
+    if golden_cross.empty and death_cross.empty:
+        print(f"合约 {symbol} 没有信号")
         return
     
-    # 创建对应的signals目录
-    if os.path.exists(signals_dir):
-        for file in os.listdir(signals_dir):
-            try:
-                os.remove(os.path.join(signals_dir, file))
-                print(f"已删除: {signals_dir}/{file}")
-            except Exception as e:
-                print(f"删除文件 {signals_dir}/{file} 时出错: {e}")
+    # 打印统计信息
+    print(f"金叉次数: {len(golden_cross)}")
+    print(f"死叉次数: {len(death_cross)}")
+    print(f"当天金叉次数: {len(golden_cross_today)}")
+    print(f"当天死叉次数: {len(death_cross_today)}")
+
+def process_batch(symbols, timeframe='30min'):
+    """一次性计算某个周期所有合约的信号，返回 {symbol: 信号}"""
+    frames = {}
+    for symbol in symbols:
+        df = bar_store.load(symbol, timeframe)
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        frames[symbol] = df
+
+    try:
+        results = calculate_ema_signals_batch(frames)
+    except Exception as e:
+        print(f"批量计算信号时出错: {e}，改为逐个合约计算")
+        results = {symbol: process_bars(df, symbol, timeframe) for symbol, df in frames.items()}
+        return {symbol: signals for symbol, signals in results.items() if signals is not None}
+
+    for symbol in symbols:
+        print(f"\n处理合约: {symbol}")
+        report_signals(results[symbol], symbol, timeframe)
+    return results
+
+def signal_table(results):
+    """把各合约的金叉死叉信号合并为一张信号表，按时间倒序
+
+    results为 {symbol: (golden_cross, death_cross, ...)}。同一时间的信号
+    按金叉在前、合约顺序排列（稳定排序），输出可复现。
+    """
+    parts = []
+    for i, signal_type in enumerate(SIGNAL_TYPES):
+        for symbol, signals in results.items():
+            signals = signals[i]
+            if signals.empty:
+                continue
+            part = signals[SIGNAL_COLUMNS].copy()
+            part['signal_type'] = signal_type
+            part['symbol'] = symbol
+            parts.append(part)
+
+    if parts:
+        table = pd.concat(parts, ignore_index=True)
     else:
+        table = pd.DataFrame({name: pd.Series(dtype=float) for name in TABLE_COLUMNS})
+        table['datetime'] = pd.Series(dtype='datetime64[ns]')
+    table['signal_type'] = pd.Categorical(table['signal_type'], categories=SIGNAL_TYPES)
+    table['symbol'] = pd.Categorical(table['symbol'], categories=list(results))
+    return table.sort_values('datetime', ascending=False, kind='stable').reset_index(drop=True)
+
+def today_view(table):
+    """信号表中当天的信号（也可用于单个合约的金叉或死叉表）"""
+    today = np.datetime64(datetime.now().date())
+    return table[table['datetime'].to_numpy().astype('datetime64[D]') == today]
+
+def write_csv_atomic(df, path):
+    """先写临时文件再替换，读取方不会看到写了一半的文件"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+    os.replace(tmp_path, path)
+
+def write_signal_table(table, timeframe='30min'):
+    """写出某个周期的信号表（all_signals.csv）和当天信号（all_signals_today.csv），并合并到信号库"""
+    signals_dir = f'{SIGNALS_DIR}/{timeframe}'
+    if not os.path.exists(signals_dir):
         os.makedirs(signals_dir)
-        print(f"创建{signals_dir}目录")
-    
-    csv_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
-    if not csv_files:
-        print(f"错误: {data_dir} 目录中没有CSV文件")
+
+    write_csv_atomic(table, f'{signals_dir}/all_signals.csv')
+    print(f"已保存汇总信号到: {signals_dir}/all_signals.csv")
+    print(f"共 {len(table)} 个信号")
+
+    today = today_view(table)
+    write_csv_atomic(today, f'{signals_dir}/all_signals_today.csv')
+    print(f"已保存汇总信号到: {signals_dir}/all_signals_today.csv")
+    print(f"共 {len(today)} 个信号")
+
+    # 表中的合约类别即本次处理过的合约
+    written = signal_store.merge(timeframe, table, list(table['symbol'].cat.categories))
+    print(f"信号库写入 {written} 个信号")
+
+def process_timeframe(timeframe, batched=True):
+    """处理指定时间周期的数据，batched为True时所有合约一起向量化计算"""
+    symbols = bar_store.symbols(timeframe)
+    if not symbols:
+        print(f"错误: 没有 {timeframe} 的K线数据")
+        # 写出空表，避免留下过期的信号
+        write_signal_table(signal_table({}), timeframe)
         return
     
     print(f"\n处理 {timeframe} 数据:")
-    print(f"找到 {len(csv_files)} 个CSV文件")
+    print(f"找到 {len(symbols)} 个合约")
     
-    # 处理每个文件
-    for file in csv_files:
-        file_path = os.path.join(data_dir, file)
-        process_file(file_path, timeframe)
+    if batched:
+        results = process_batch(symbols, timeframe)
+    else:
+        # 处理每个合约
+        results = {}
+        for symbol in symbols:
+            signals = process_bars(bar_store.load(symbol, timeframe), symbol, timeframe)
+            if signals is not None:
+                results[symbol] = signals
     
-    # 汇总所有信号
-    aggregate_signals(timeframe)
+    # 合并为一张信号表并写出
+    write_signal_table(signal_table(results), timeframe)
+
+def to_records(signals):
+    """信号DataFrame转换为紧凑的结构化数组"""
+    records = np.zeros(len(signals), dtype=SIGNAL_RECORD)
+    records['datetime'] = signals['datetime'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    for name in SIGNAL_COLUMNS[1:]:
+        records[name] = signals[name].to_numpy(dtype=float)
+    return records
+
+def from_records(records):
+    """结构化数组还原为信号DataFrame"""
+    df = pd.DataFrame({name: records[name] for name in SIGNAL_COLUMNS[1:]})
+    df.insert(0, 'datetime', records['datetime'].view('datetime64[ns]'))
+    return df
+
+def compute_timeframe_records(timeframe):
+    """在子进程中批量计算某个周期所有合约的信号
+
+    所有合约用calculate_ema_signals_batch一次计算，批量计算出错时改为逐个合约
+    计算，单个合约出错只跳过该合约。只返回信号表需要的列，用结构化数组代替
+    DataFrame，减少进程间序列化的数据量。返回 {symbol: (金叉记录, 死叉记录)}。
+    """
+    frames = {symbol: bar_store.load(symbol, timeframe) for symbol in bar_store.symbols(timeframe)}
+    try:
+        results = calculate_ema_signals_batch(frames)
+    except Exception as e:
+        print(f"批量计算 {timeframe} 信号时出错: {e}，改为逐个合约计算")
+        results = {}
+        for symbol, df in frames.items():
+            try:
+                results[symbol] = calculate_ema_signals(df, symbol, timeframe)
+            except Exception as e:
+                print(f"处理合约 {symbol} 时出错: {e}")
+    return {symbol: (to_records(signals[0]), to_records(signals[1])) for symbol, signals in results.items()}
+
+def process_parallel(timeframes=TIMEFRAMES, max_workers=None):
+    """每个周期一个子进程，在子进程中批量计算该周期所有合约的信号
+
+    结果按 (周期, 合约) 的固定顺序在主进程中合并，信号表与串行处理相同。
+    """
+    print(f"\n并行处理 {len(timeframes)} 个周期")
+    results = {}
+    max_workers = max(1, min(max_workers or len(timeframes), len(timeframes)))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(compute_timeframe_records, timeframe) for timeframe in timeframes]
+        for timeframe, future in zip(timeframes, futures):
+            try:
+                records = future.result()
+            except Exception as e:
+                print(f"处理 {timeframe} 数据时出错: {e}")
+                continue
+            results[timeframe] = {}
+            if not records:
+                print(f"错误: 没有 {timeframe} 的K线数据")
+            for symbol, (golden_records, death_records) in records.items():
+                print(f"\n处理合约: {symbol} ({timeframe})")
+                golden_cross, death_cross = from_records(golden_records), from_records(death_records)
+                signals = (golden_cross, death_cross, today_view(golden_cross), today_view(death_cross))
+                report_signals(signals, symbol, timeframe)
+                results[timeframe][symbol] = signals
+
+    # 每个周期写出一张信号表，没有合约时写出空表，避免留下过期的信号；
+    # 整个周期计算失败时保留上次的信号表
+    for timeframe in timeframes:
+        if timeframe in results:
+            write_signal_table(signal_table(results[timeframe]), timeframe)
 
 def main():
+    parser = argparse.ArgumentParser(description='计算EMA金叉死叉信号')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认每个周期一个进程；为1时在当前进程计算')
+    args = parser.parse_args()
+
     # 确保主signals目录存在
-    if not os.path.exists('signals'):
-        os.makedirs('signals')
+    if not os.path.exists(SIGNALS_DIR):
+        os.makedirs(SIGNALS_DIR)
     
     # 处理30分钟和5分钟数据
-    process_timeframe('30min')
-    process_timeframe('5min')
+    if args.workers == 1:
+        for timeframe in TIMEFRAMES:
+            process_timeframe(timeframe)
+    else:
+        process_parallel(TIMEFRAMES, args.workers)
+
+    # 导出看板使用的每个品种上一个/当前信号
+    signal_store.export_dashboard('5min')
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
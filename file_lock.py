@@ -0,0 +1,65 @@
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    """跨进程的排他文件锁
+
+    Linux/macOS使用fcntl.flock，Windows使用msvcrt.locking。锁随文件描述符
+    释放，进程崩溃时不会留下死锁。timeout为None时一直等待，超时抛出TimeoutError。
+    """
+
+    def __init__(self, path, timeout=None, poll_interval=0.05):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.file = None
+
+    def _try_lock(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, 'a+b')
+        start = time.monotonic()
+        while not self._try_lock():
+            if self.timeout is not None and time.monotonic() - start >= self.timeout:
+                self.file.close()
+                self.file = None
+                raise TimeoutError(f"等待文件锁超时: {self.path}")
+            time.sleep(self.poll_interval)
+
+    def release(self):
+        if self.file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -1,11 +1,25 @@
-import akshare as ak
 import pandas as pd
-import os
-import shutil
-from datetime import datetime
-import time
-import concurrent.futures
-import random
+import re
+from bar_store import BarStore
+from bar_resample import resample_bars
+from async_fetcher import download, run_fetch_cycle, sina_limiter
+from bar_cache import bar_cache
+
+bar_store = BarStore()
+# 由1分钟数据在本地合成的周期
+DERIVED_PERIODS = ('5', '30')
+
+# 品种代码 -> 交易所（CTP的交易所代码）
+PRODUCT_EXCHANGES = {
+    'RB': 'SHFE', 'HC': 'SHFE', 'FU': 'SHFE', 'BU': 'SHFE', 'SP': 'SHFE', 'AL': 'SHFE',
+    'AO': 'SHFE', 'NI': 'SHFE', 'ZN': 'SHFE', 'RU': 'SHFE', 'CU': 'SHFE', 'AU': 'SHFE', 'AG': 'SHFE',
+    'MA': 'CZCE', 'SA': 'CZCE', 'RM': 'CZCE', 'FG': 'CZCE', 'SH': 'CZCE', 'TA': 'CZCE', 'PX': 'CZCE',
+    'OI': 'CZCE', 'UR': 'CZCE', 'SR': 'CZCE', 'SM': 'CZCE', 'SF': 'CZCE', 'CF': 'CZCE',
+    'V': 'DCE', 'Y': 'DCE', 'C': 'DCE', 'EB': 'DCE', 'LH': 'DCE', 'PP': 'DCE', 'M': 'DCE', 'I': 'DCE',
+    'L': 'DCE', 'A': 'DCE', 'B': 'DCE', 'JD': 'DCE', 'P': 'DCE', 'J': 'DCE', 'JM': 'DCE', 'EG': 'DCE',
+    'SC': 'INE', 'LU': 'INE', 'NR': 'INE', 'BC': 'INE',
+    'SI': 'GFEX', 'LC': 'GFEX'
+}
 
 def get_all_futures_symbols():
     """获取所有期货品种的连续合约代码，并替换为2505和2509"""
@@ -25,126 +39,108 @@ def get_all_futures_symbols():
         print(f"获取合约列表失败: {e}")
         return []
 
-def get_5min_data(symbol, max_retries=3):
-    """获取单个合约的5分钟数据，添加重试机制"""
+def symbol_exchange(symbol):
+    """合约所在交易所的代码（如'SHFE'），未知品种返回None"""
+    product = re.match(r'[A-Za-z]+', symbol)
+    return PRODUCT_EXCHANGES.get(product.group().upper()) if product else None
+
+def get_minute_data(symbol, period, max_retries=3):
+    """获取单个合约指定周期的分钟数据
+
+    先读共享行情缓存，当前K线收盘前其他程序已获取过的数据不再请求网络。
+    """
+    return bar_cache.get(symbol, period, lambda: download_minute_data(symbol, period, max_retries))
+
+def download_minute_data(symbol, period, max_retries=3):
+    """从新浪获取单个合约指定周期的分钟数据，添加重试机制
+
+    每次请求（包括重试）先从进程共用的令牌桶取令牌，与异步获取共用限速。
+    """
     for attempt in range(max_retries):
+        sina_limiter.take()
         try:
-            # 获取5分钟K线数据
-            df = ak.futures_zh_minute_sina(symbol=symbol, period="5")
+            df = download(symbol, period)
             if df is not None and not df.empty:
-                # 添加时间戳列
-                df['timestamp'] = datetime.now().strftime('%Y%m%d_%H%M%S')
                 return df
-            else:
-                print(f"获取{symbol}数据为空，尝试重试 {attempt+1}/{max_retries}")
+            print(f"获取{symbol}数据为空，尝试重试 {attempt+1}/{max_retries}")
         except Exception as e:
             print(f"获取{symbol}数据失败: {e}，尝试重试 {attempt+1}/{max_retries}")
-        
-        # 随机延迟0.5-2秒，避免请求过于频繁
-        time.sleep(random.uniform(0.5, 2))
     
     print(f"获取{symbol}数据失败，已达到最大重试次数")
     return None
 
+def get_5min_data(symbol, max_retries=3):
+    """获取单个合约的5分钟数据"""
+    return get_minute_data(symbol, "5", max_retries)
+
 def get_30min_data(symbol, max_retries=3):
-    """获取单个合约的30分钟数据，添加重试机制"""
-    for attempt in range(max_retries):
-        try:
-            # 获取30分钟K线数据
-            df = ak.futures_zh_minute_sina(symbol=symbol, period="30")
-            if df is not None and not df.empty:
-                # 添加时间戳列
-                df['timestamp'] = datetime.now().strftime('%Y%m%d_%H%M%S')
-                return df
-            else:
-                print(f"获取{symbol}数据为空，尝试重试 {attempt+1}/{max_retries}")
-        except Exception as e:
-            print(f"获取{symbol}数据失败: {e}，尝试重试 {attempt+1}/{max_retries}")
-        
-        # 随机延迟0.5-2秒，避免请求过于频繁
-        time.sleep(random.uniform(0.5, 2))
-    
-    print(f"获取{symbol}数据失败，已达到最大重试次数")
-    return None
+    """获取单个合约的30分钟数据"""
+    return get_minute_data(symbol, "30", max_retries)
 
 def get_1min_data(symbol, max_retries=3):
-    """获取单个合约的1分钟数据，添加重试机制"""
-    for attempt in range(max_retries):
-        try:
-            # 获取1分钟K线数据
-            df = ak.futures_zh_minute_sina(symbol=symbol, period="1")
-            if df is not None and not df.empty:
-                # 添加时间戳列
-                df['timestamp'] = datetime.now().strftime('%Y%m%d_%H%M%S')
-                return df
-            else:
-                print(f"获取{symbol}数据为空，尝试重试 {attempt+1}/{max_retries}")
-        except Exception as e:
-            print(f"获取{symbol}数据失败: {e}，尝试重试 {attempt+1}/{max_retries}")
-        
-        # 随机延迟0.5-2秒，避免请求过于频繁
-        time.sleep(random.uniform(0.5, 2))
-    
-    print(f"获取{symbol}数据失败，已达到最大重试次数")
-    return None
+    """获取单个合约的1分钟数据"""
+    return get_minute_data(symbol, "1", max_retries)
 
-def save_to_csv(df, symbol, timeframe):
-    """保存数据到CSV文件"""
+def save_to_store(df, symbol, timeframe):
+    """把新K线合并到按品种存储的K线文件"""
     if df is not None and not df.empty:
-        # 创建对应时间周期的目录
-        data_dir = f'data/{timeframe}min'
-        if not os.path.exists(data_dir):
-            os.makedirs(data_dir)
-        
-        # 生成文件名
-        filename = f"{data_dir}/{symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        df.to_csv(filename, index=False, encoding='utf-8-sig')
-        print(f"数据已保存到: {filename}")
+        new_bars = bar_store.append(symbol, f'{timeframe}min', df)
+        print(f"{symbol} {timeframe}分钟数据已更新，新增 {new_bars} 根K线")
+
+def needs_seed(symbol):
+    """本地还没有5分钟或30分钟历史时，需要先获取一次原始周期数据"""
+    return any(bar_store.count(symbol, f'{period}min') == 0 for period in DERIVED_PERIODS)
+
+def seed_history(symbol):
+    """获取原始5分钟和30分钟数据补齐历史"""
+    for period in DERIVED_PERIODS:
+        save_to_store(get_minute_data(symbol, period), symbol, period)
+
+def find_gap(symbol, df_1min):
+    """检查本地1分钟K线与新获取数据之间是否有缺口
+
+    新浪只返回最近一段1分钟数据，断线超过这段时间后，新数据的第一根晚于
+    本地最后一根，中间的K线无法再从1分钟接口取得。返回(本地最后一根时间,
+    新数据第一根时间)，没有缺口或本地没有数据时返回None。
+    """
+    last = bar_store.last_datetime(symbol, '1min')
+    if last is None or df_1min is None or df_1min.empty:
+        return None
+    first = pd.to_datetime(df_1min['datetime']).min()
+    return (last, first) if first > last else None
+
+def update_from_1min(symbol, df_1min, seed=True):
+    """保存1分钟数据，并由其合成5分钟和30分钟K线
+
+    与本地数据之间有缺口时记录下来；seed为True时先用原始周期数据补齐
+    5分钟和30分钟K线（K线只能向后追加，必须在合成的K线写入之前补齐）。
+    1分钟K线的缺口无法补齐。返回缺口，没有缺口返回None。
+    """
+    gap = find_gap(symbol, df_1min)
+    if gap is not None:
+        print(f"{symbol} 1分钟数据缺口: {gap[0]} 至 {gap[1]} 之间的K线已无法获取")
+        if seed:
+            seed_history(symbol)
+    save_to_store(df_1min, symbol, "1")
+    for period in DERIVED_PERIODS:
+        save_to_store(resample_bars(df_1min, int(period)), symbol, period)
+    return gap
 
 def process_symbol(symbol):
     """处理单个合约的数据获取和保存"""
     print(f"\n正在获取 {symbol} 的数据...")
     
-    # 获取5分钟数据
-    df_5min = get_5min_data(symbol)
-    if df_5min is not None:
-        save_to_csv(df_5min, symbol, "5")
-    
-    # 获取30分钟数据
-    df_30min = get_30min_data(symbol)
-    if df_30min is not None:
-        save_to_csv(df_30min, symbol, "30")
+    # 首次运行时用原始周期数据补齐较长的历史
+    if needs_seed(symbol):
+        seed_history(symbol)
     
-    # 获取1分钟数据
-    # df_1min = get_1min_data(symbol)
-    # if df_1min is not None:
-    #     save_to_csv(df_1min, symbol, "1")
-    
-    # 添加随机延时避免请求过于频繁
-    time.sleep(random.uniform(0.5, 1.5))
+    # 只获取1分钟数据，5分钟和30分钟在本地合成；请求间隔由共用令牌桶控制
+    df_1min = get_1min_data(symbol)
+    if df_1min is not None:
+        update_from_1min(symbol, df_1min)
     return symbol
 
-def clear_directory(directory_path):
-    """清空指定目录下的所有文件"""
-    if os.path.exists(directory_path):
-        for filename in os.listdir(directory_path):
-            file_path = os.path.join(directory_path, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path)
-            except Exception as e:
-                print(f"清理文件 {file_path} 时出错: {e}")
-        print(f"已清空目录: {directory_path}")
-    else:
-        print(f"目录不存在: {directory_path}")
-
 def main():
-    # 清空5min和30min目录
-    clear_directory('data/5min')
-    clear_directory('data/30min')
-    
     # 获取所有期货品种的主力和次主力合约代码
     symbols = get_all_futures_symbols()
     if not symbols:
@@ -153,21 +149,48 @@ def main():
     
     print(f"\n开始获取以下合约的行情数据：{symbols}")
     
-    # 使用更保守的并行度，减少并发请求数量
-    max_workers = 3  # 降低并行度
+    # 首次运行时用原始周期数据补齐较长的历史
+    unseeded = [symbol for symbol in symbols if needs_seed(symbol)]
+    if unseeded:
+        print(f"\n补齐历史数据: {unseeded}")
+        run_fetch_cycle(
+            unseeded,
+            periods=DERIVED_PERIODS,
+            on_result=lambda symbol, period, df: save_to_store(df, symbol, period)
+        )
+    
+    # 每个合约只获取1分钟数据，5分钟和30分钟在本地合成；
+    # 所有请求在限速范围内同时进行，超过截止时间的本轮放弃
+    gapped = {}
+    
+    def on_1min(symbol, period, df):
+        # 有缺口的合约先补齐历史再保存，补齐放到本轮结束后，不阻塞事件循环
+        if find_gap(symbol, df) is not None:
+            gapped[symbol] = df
+        else:
+            update_from_1min(symbol, df)
+    
+    report = run_fetch_cycle(symbols, periods=('1',), on_result=on_1min)
+    
+    if gapped:
+        print(f"\n补齐断线期间的历史数据: {list(gapped)}")
+        run_fetch_cycle(
+            list(gapped),
+            periods=DERIVED_PERIODS,
+            on_result=lambda symbol, period, df: save_to_store(df, symbol, period)
+        )
+        for symbol, df in gapped.items():
+            update_from_1min(symbol, df, seed=False)
     
-    # 使用ThreadPoolExecutor并行处理
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务并获取结果
-        futures = [executor.submit(process_symbol, symbol) for symbol in symbols]
-        
-        # 等待所有任务完成
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                symbol = future.result()
-                print(f"完成获取 {symbol} 的数据")
-            except Exception as e:
-                print(f"处理合约时发生错误: {e}")
+    print(f"\n本轮耗时 {report['elapsed']:.1f} 秒")
+    print(f"获取成功 {len(report['fetched'])} 个合约: {report['fetched']}")
+    if report['failed']:
+        print(f"获取失败 {len(report['failed'])} 个合约: {report['failed']}")
+    if report['missed']:
+        print(f"超时未完成 {len(report['missed'])} 个合约: {report['missed']}")
+    stats = bar_cache.stats()
+    print(f"行情缓存命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
+    return report
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,297 @@
+import pandas as pd
+import numpy as np
+import talib
+import math
+from fractions import Fraction
+
+FAST_PERIOD = 8
+SLOW_PERIOD = 21
+SLOPE_WINDOW = 3
+ANGLE_THRESHOLD = 15
+
+def _talib_uses_fma():
+    """检测TA-Lib的EMA递推是否被编译成融合乘加（取决于平台和编译选项）"""
+    closes = 3000 + np.cumsum(np.random.default_rng(0).standard_normal(5000) * 1000)
+    ema = talib.EMA(closes, timeperiod=8)
+    k = 2.0 / 9
+    plain = ((closes[8:] - ema[7:-1]) * k) + ema[7:-1]
+    return not np.array_equal(plain, ema[8:])
+
+TALIB_FMA = _talib_uses_fma()
+
+def ema_step(x, prev, k):
+    """EMA递推一步，与TA-Lib的 ((x-prev)*k)+prev 舍入方式一致"""
+    if TALIB_FMA and math.isfinite(x) and math.isfinite(prev):
+        # 融合乘加只舍入一次，用分数精确计算后再转回浮点数
+        return float(Fraction(x - prev) * Fraction(k) + Fraction(prev))
+    return ((x - prev) * k) + prev
+
+class EmaState:
+    """单条EMA的增量状态，递推公式与TA-Lib一致（前period个值的SMA作为初值）"""
+
+    __slots__ = ('period', 'k', 'count', 'total', 'value')
+
+    def __init__(self, period, count=0, total=0.0, value=math.nan):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.count = count
+        self.total = total
+        self.value = value
+
+    def copy(self):
+        return EmaState(self.period, self.count, self.total, self.value)
+
+    def to_state(self):
+        return [self.period, self.count, self.total, self.value]
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(*state)
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.period:
+            self.total += x
+        elif self.count == self.period:
+            self.total += x
+            self.value = self.total / self.period
+        else:
+            self.value = ema_step(x, self.value, self.k)
+        return self.value
+
+    @classmethod
+    def from_history(cls, period, closes, ema_values):
+        """由历史收盘价和TA-Lib的计算结果恢复状态"""
+        state = cls(period, count=len(closes))
+        if len(closes) < period:
+            state.total = 0.0
+            for x in closes:
+                state.total += x
+        else:
+            state.value = float(ema_values[-1])
+        return state
+
+class SymbolState:
+    """单个合约的指标状态：两条EMA、最近几根的EMA值、交叉方向和最近的信号"""
+
+    __slots__ = ('fast', 'slow', 'recent', 'cross', 'datetime', 'last_golden', 'last_death')
+
+    def __init__(self, fast, slow, recent=(), cross=None, datetime=None, last_golden=None, last_death=None):
+        self.fast = fast
+        self.slow = slow
+        self.recent = recent  # 最近SLOPE_WINDOW+1根K线的(EMA8, EMA21)
+        self.cross = cross
+        self.datetime = datetime
+        self.last_golden = last_golden
+        self.last_death = last_death
+
+    def copy(self):
+        return SymbolState(self.fast.copy(), self.slow.copy(), self.recent, self.cross,
+                           self.datetime, self.last_golden, self.last_death)
+
+    def to_state(self):
+        """转换为可JSON序列化的字典（时间为ISO格式字符串）"""
+        def signal_state(signal):
+            return None if signal is None else dict(signal, datetime=signal['datetime'].isoformat())
+
+        return {
+            'fast': self.fast.to_state(),
+            'slow': self.slow.to_state(),
+            'recent': [list(pair) for pair in self.recent],
+            'cross': self.cross,
+            'datetime': self.datetime.isoformat() if self.datetime is not None else None,
+            'last_golden': signal_state(self.last_golden),
+            'last_death': signal_state(self.last_death)
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        def signal(data):
+            return None if data is None else dict(data, datetime=pd.Timestamp(data['datetime']))
+
+        return cls(
+            EmaState.from_state(state['fast']),
+            EmaState.from_state(state['slow']),
+            recent=tuple(tuple(pair) for pair in state['recent']),
+            cross=state['cross'],
+            datetime=pd.Timestamp(state['datetime']) if state['datetime'] is not None else None,
+            last_golden=signal(state['last_golden']),
+            last_death=signal(state['last_death'])
+        )
+
+class IndicatorEngine:
+    """增量计算EMA8/EMA21金叉死叉
+
+    每根新K线O(1)更新，结果与calculate_ema_signals的批量TA-Lib计算逐位一致。
+    最后一根K线未走完时可以用相同datetime重复更新，会基于上一根K线的状态重算。
+    信号只通过update/update_bars的返回值发出，每个信号只发出一次；seed时
+    历史中的信号不会发出，也不对外提供，避免把旧信号当作新信号。
+    """
+
+    def __init__(self, fast_period=FAST_PERIOD, slow_period=SLOW_PERIOD, angle_threshold=ANGLE_THRESHOLD):
+        self.fast_period = fast_period
+        self.slow_period = slow_period
+        self.angle_threshold = angle_threshold
+        self.states = {}     # symbol -> 最后一根K线之后的状态
+        self.committed = {}  # symbol -> 最后一根K线之前的状态
+        self.emitted = {}    # symbol -> 最后一根K线已发出信号的(datetime, signal_type)
+
+    def seeded(self, symbol):
+        return symbol in self.states
+
+    def last_datetime(self, symbol):
+        """最后处理的K线时间，没有则为None"""
+        return self.states[symbol].datetime
+
+    def seed(self, symbol, df):
+        """用历史K线批量初始化状态（最后一根K线增量更新，以便之后修正）"""
+        df = df.sort_values('datetime', kind='stable')
+        closes = df['close'].to_numpy(dtype=float)
+        times = pd.to_datetime(df['datetime']).to_numpy()
+        history = closes[:-1]
+
+        fast_ema = talib.EMA(history, timeperiod=self.fast_period) if len(history) else history
+        slow_ema = talib.EMA(history, timeperiod=self.slow_period) if len(history) else history
+        state = SymbolState(
+            EmaState.from_history(self.fast_period, history, fast_ema),
+            EmaState.from_history(self.slow_period, history, slow_ema),
+            recent=tuple(zip(fast_ema[-(SLOPE_WINDOW + 1):].tolist(), slow_ema[-(SLOPE_WINDOW + 1):].tolist())),
+        )
+        if len(history):
+            state.cross = 1 if fast_ema[-1] > slow_ema[-1] else -1
+            state.datetime = pd.Timestamp(times[-2])
+            state.last_golden, state.last_death = self._last_signals(df.iloc[:-1], fast_ema, slow_ema)
+
+        self.states[symbol] = state
+        self.committed[symbol] = state.copy()
+        self.emitted[symbol] = set()
+        if len(closes):
+            self.update(symbol, times[-1], closes[-1])
+        # 历史信号不作为新信号发出
+        state = self.states[symbol]
+        self.emitted[symbol] = {(signal['datetime'], signal['signal_type'])
+                                for signal in (state.last_golden, state.last_death) if signal}
+
+    def _last_signals(self, df, fast_ema, slow_ema):
+        """在历史数据中找最近一次金叉和死叉"""
+        fast_slope = pd.Series(fast_ema).diff(SLOPE_WINDOW) / SLOPE_WINDOW
+        slow_slope = pd.Series(slow_ema).diff(SLOPE_WINDOW) / SLOPE_WINDOW
+        angle = np.degrees(np.arctan2(fast_slope - slow_slope, 1)).to_numpy()
+        cross = np.where(fast_ema > slow_ema, 1, -1)
+        cross_change = np.diff(cross, prepend=np.nan)
+
+        result = []
+        for mask, signal_type in (((cross_change == 2) & (angle > self.angle_threshold), 'golden_cross'),
+                                  ((cross_change == -2) & (angle < -self.angle_threshold), 'death_cross')):
+            rows = np.flatnonzero(mask)
+            if len(rows):
+                i = rows[-1]
+                result.append({
+                    'datetime': pd.Timestamp(df['datetime'].iloc[i]),
+                    'close': float(df['close'].iloc[i]),
+                    'EMA8': float(fast_ema[i]),
+                    'EMA21': float(slow_ema[i]),
+                    'angle_degrees': float(angle[i]),
+                    'signal_type': signal_type
+                })
+            else:
+                result.append(None)
+        return result
+
+    def update(self, symbol, datetime, close):
+        """输入一根K线，返回本次新产生的信号（没有则返回None）
+
+        datetime与上一根相同视为同一根K线的修正；早于上一根的K线被忽略。
+        """
+        datetime = pd.Timestamp(datetime)
+        state = self.states[symbol]
+        if state.datetime is not None:
+            if datetime < state.datetime:
+                return None
+            if datetime == state.datetime:
+                state = self.committed[symbol].copy()
+            else:
+                self.committed[symbol] = state.copy()
+                self.emitted[symbol] = set()
+        else:
+            self.committed[symbol] = state.copy()
+
+        close = float(close)
+        fast = state.fast.update(close)
+        slow = state.slow.update(close)
+        recent = (state.recent + ((fast, slow),))[-(SLOPE_WINDOW + 1):]
+
+        cross = 1 if fast > slow else -1
+        cross_change = cross - state.cross if state.cross is not None else math.nan
+        if len(recent) > SLOPE_WINDOW:
+            fast_slope = (fast - recent[0][0]) / SLOPE_WINDOW
+            slow_slope = (slow - recent[0][1]) / SLOPE_WINDOW
+            angle = math.degrees(math.atan2(fast_slope - slow_slope, 1))
+        else:
+            angle = math.nan
+
+        state.recent = recent
+        state.cross = cross
+        state.datetime = datetime
+        self.states[symbol] = state
+
+        signal_type = None
+        if cross_change == 2 and angle > self.angle_threshold:
+            signal_type = 'golden_cross'
+        elif cross_change == -2 and angle < -self.angle_threshold:
+            signal_type = 'death_cross'
+        if signal_type is None:
+            return None
+
+        signal = {
+            'datetime': datetime,
+            'close': close,
+            'EMA8': fast,
+            'EMA21': slow,
+            'angle_degrees': angle,
+            'signal_type': signal_type
+        }
+        if signal_type == 'golden_cross':
+            state.last_golden = signal
+        else:
+            state.last_death = signal
+
+        key = (datetime, signal_type)
+        if key in self.emitted[symbol]:
+            return None
+        self.emitted[symbol].add(key)
+        return signal
+
+    def update_bars(self, symbol, df):
+        """输入新获取的K线（可以包含已处理过的历史），返回新产生的信号列表"""
+        state = self.states[symbol]
+        df = df.sort_values('datetime', kind='stable')
+        times = pd.to_datetime(df['datetime'])
+        if state.datetime is not None:
+            df = df[times.to_numpy() >= state.datetime.to_datetime64()]
+            times = pd.to_datetime(df['datetime'])
+
+        signals = []
+        for datetime, close in zip(times, df['close'].to_numpy(dtype=float)):
+            signal = self.update(symbol, datetime, close)
+            if signal is not None:
+                signals.append(signal)
+        return signals
+
+    def to_state(self):
+        """全部合约的状态（可JSON序列化），用于保存快照"""
+        return {
+            symbol: {
+                'state': self.states[symbol].to_state(),
+                'committed': self.committed[symbol].to_state(),
+                'emitted': [[datetime.isoformat(), signal_type] for datetime, signal_type in self.emitted[symbol]]
+            }
+            for symbol in self.states
+        }
+
+    def load_state(self, state):
+        """从to_state的结果恢复，之后的update与未中断时逐位一致"""
+        for symbol, data in state.items():
+            self.states[symbol] = SymbolState.from_state(data['state'])
+            self.committed[symbol] = SymbolState.from_state(data['committed'])
+            self.emitted[symbol] = {(pd.Timestamp(datetime), signal_type) for datetime, signal_type in data['emitted']}
@@ -0,0 +1,151 @@
+import pandas as pd
+import numpy as np
+import talib
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 指标注册表：名称 -> (输入列, 计算函数)
+INDICATORS = {}
+
+def indicator(name, inputs):
+    """注册指标，inputs为依赖的K线列或其他指标名，计算函数按顺序接收这些数组"""
+    def register(func):
+        INDICATORS[name] = (tuple(inputs), func)
+        return func
+    return register
+
+def diff(values, periods=1):
+    """与pandas的Series.diff相同的差分，前periods个为NaN"""
+    result = np.full(len(values), np.nan)
+    result[periods:] = values[periods:] - values[:-periods]
+    return result
+
+@indicator('EMA8', ['close'])
+def ema8(close):
+    return talib.EMA(close, timeperiod=8)
+
+@indicator('EMA21', ['close'])
+def ema21(close):
+    return talib.EMA(close, timeperiod=21)
+
+# 斜率（使用3个点的差分来平滑）
+@indicator('EMA8_slope', ['EMA8'])
+def ema8_slope(ema):
+    return diff(ema, 3) / 3
+
+@indicator('EMA21_slope', ['EMA21'])
+def ema21_slope(ema):
+    return diff(ema, 3) / 3
+
+# 两条均线斜率差的角度（弧度）
+@indicator('angle', ['EMA8_slope', 'EMA21_slope'])
+def angle(fast_slope, slow_slope):
+    return np.arctan2(fast_slope - slow_slope, 1)
+
+@indicator('angle_degrees', ['angle'])
+def angle_degrees(angle):
+    return np.degrees(angle)
+
+# 1表示EMA8在EMA21之上（多头），-1表示之下（空头）
+@indicator('cross', ['EMA8', 'EMA21'])
+def cross(fast, slow):
+    return np.where(fast > slow, 1, -1)
+
+# 2为金叉，-2为死叉
+@indicator('cross_change', ['cross'])
+def cross_change(cross):
+    return diff(cross)
+
+# data_version参与哈希的末尾K线数
+VERSION_TAIL_BARS = 64
+
+def data_version(df):
+    """K线数据的版本：行数、首根K线时间和末尾VERSION_TAIL_BARS根K线（时间、收盘价）的哈希
+
+    K线只在末尾追加，修正也只发生在最后几根（未走完的K线），所以不必哈希整列，
+    每次查找的开销与数据长度无关。代价是看不到末尾VERSION_TAIL_BARS根之前的
+    修改：行数和首尾都不变、只改了更早K线的数据会被当作同一版本。会改写历史的
+    调用方应自己传入version，或传cache=None不使用缓存。
+    """
+    if df.empty:
+        return (0,)
+    digest = hashlib.blake2b(digest_size=16)
+    tail = df.iloc[-VERSION_TAIL_BARS:]
+    digest.update(pd.to_datetime(tail['datetime']).to_numpy(dtype='datetime64[ns]').tobytes())
+    digest.update(tail['close'].to_numpy(dtype=float).tobytes())
+    return (len(df), pd.Timestamp(df['datetime'].iloc[0]).value, digest.hexdigest())
+
+class IndicatorCache:
+    """按 (symbol, timeframe, 数据版本, 指标名) 缓存指标结果，超过上限按最近使用淘汰
+
+    缓存只在一个进程内有效，不在进程或程序之间共享。EMA取决于数据的第一根
+    K线，只有行数和首尾K线都相同的数据才能复用结果：各程序截取的区间不同
+    （trend_strategy取最近1000根，live_monitor取昨天以来的K线，
+    calculate_signals在子进程中批量计算），彼此不会命中。实际省下的是同一
+    进程对同一份数据的重复计算，例如数据未更新时再次检查同一合约，以及
+    依赖同一EMA的多个指标。缓存的数组设为只读。
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            values = self.entries.get(key)
+            if values is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+    def put(self, key, values):
+        values.setflags(write=False)
+        with self.lock:
+            self.entries[key] = values
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+indicator_cache = IndicatorCache()
+
+def compute(df, names, symbol=None, timeframe=None, version=None, cache=indicator_cache):
+    """计算指标及其依赖，返回 {指标名: 数组}
+
+    给出symbol和timeframe时结果按数据版本缓存在本进程内，同一份数据的指标
+    只计算一次；version默认由data_version计算。不修改传入的DataFrame。
+    """
+    key = None
+    if symbol is not None and cache is not None:
+        key = (symbol, timeframe, version if version is not None else data_version(df))
+
+    results = {}
+
+    def resolve(name):
+        if name in results:
+            return results[name]
+        if name not in INDICATORS:
+            # 原始K线列
+            values = df[name].to_numpy(dtype=float)
+        else:
+            values = cache.get(key + (name,)) if key is not None else None
+            if values is None:
+                inputs, func = INDICATORS[name]
+                values = func(*[resolve(dependency) for dependency in inputs])
+                if key is not None:
+                    cache.put(key + (name,), values)
+        results[name] = values
+        return values
+
+    return {name: resolve(name) for name in names}
+
+def with_indicators(df, names, symbol=None, timeframe=None, version=None, cache=indicator_cache):
+    """返回附加了指标列的新DataFrame，原DataFrame不变"""
+    # 复制一份，缓存中的只读数组不会被DataFrame上的修改影响
+    columns = compute(df, names, symbol, timeframe, version, cache)
+    return df.assign(**{name: values.copy() for name, values in columns.items()})
@@ -0,0 +1,110 @@
+import numpy as np
+import os
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_FILE = 'logs/latency.prom'
+# 每个 (阶段, 品种) 保留最近的样本数
+RING_SIZE = 2048
+
+class LatencyRing:
+    """固定大小的耗时样本环形缓冲（秒）
+
+    写入不加锁：只做一次数组赋值和计数加一，并发写入时偶尔覆盖同一个槽位，
+    只影响统计样本，不会阻塞调用方。count和total是全部样本（不只是环中保留的）
+    的个数和总耗时，对应Prometheus summary的_count和_sum。
+    """
+
+    __slots__ = ('values', 'count', 'total')
+
+    def __init__(self, size=RING_SIZE):
+        self.values = np.zeros(size)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        i = self.count
+        self.values[i % len(self.values)] = seconds
+        self.count = i + 1
+        self.total += seconds
+
+    def samples(self):
+        return self.values[:min(self.count, len(self.values))].copy()
+
+class LatencyRecorder:
+    """实盘各阶段耗时统计，按 (阶段, 品种) 计算p50/p99/max，定期导出到本地文件"""
+
+    def __init__(self, ring_size=RING_SIZE):
+        self.ring_size = ring_size
+        self.rings = {}  # (stage, symbol) -> LatencyRing
+
+    def record(self, stage, seconds, symbol=''):
+        key = (stage, symbol or '')
+        ring = self.rings.get(key)
+        if ring is None:
+            ring = self.rings.setdefault(key, LatencyRing(self.ring_size))
+        ring.record(seconds)
+
+    @contextmanager
+    def span(self, stage, symbol=''):
+        """统计代码块耗时，出错也记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, symbol)
+
+    def summary(self):
+        """每个 (阶段, 品种) 的样本数、总耗时和p50/p99/max（秒）"""
+        rows = []
+        for (stage, symbol), ring in sorted(list(self.rings.items())):
+            samples = ring.samples()
+            if not len(samples):
+                continue
+            p50, p99 = np.percentile(samples, [50, 99])
+            rows.append({
+                'stage': stage,
+                'symbol': symbol,
+                'count': ring.count,
+                'sum': ring.total,
+                'p50': float(p50),
+                'p99': float(p99),
+                'max': float(samples.max())
+            })
+        return rows
+
+    def export(self, path=METRICS_FILE):
+        """导出统计：.jsonl 追加一行JSON，其他扩展名写Prometheus文本格式（原子替换）"""
+        rows = self.summary()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        if path.endswith('.jsonl'):
+            line = json.dumps({'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'latency': rows},
+                              ensure_ascii=False)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+            return rows
+
+        lines = ['# HELP live_latency_seconds 实盘各阶段耗时',
+                 '# TYPE live_latency_seconds summary']
+        for row in rows:
+            labels = f'stage="{row["stage"]}",symbol="{row["symbol"]}"'
+            lines.append(f'live_latency_seconds{{{labels},quantile="0.5"}} {row["p50"]:.6f}')
+            lines.append(f'live_latency_seconds{{{labels},quantile="0.99"}} {row["p99"]:.6f}')
+            lines.append(f'live_latency_seconds_sum{{{labels}}} {row["sum"]:.6f}')
+            lines.append(f'live_latency_seconds_count{{{labels}}} {row["count"]}')
+        lines.append('# TYPE live_latency_max_seconds gauge')
+        for row in rows:
+            lines.append(f'live_latency_max_seconds{{stage="{row["stage"]}",symbol="{row["symbol"]}"}} {row["max"]:.6f}')
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+        return rows
+
+latency = LatencyRecorder()
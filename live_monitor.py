@@ -4,44 +4,33 @@ import time
 from datetime import datetime, timedelta
 import os
 from get_futures_data import get_all_futures_symbols, process_symbol
-from calculate_signals import calculate_ema_signals
 import concurrent.futures
 import numpy as np
-import talib
+from bar_store import BarStore
+from indicators import with_indicators
+from signal_store import SignalStore
+
+bar_store = BarStore()
+signal_store = SignalStore()
 
 def load_latest_data():
     """加载最新的5分钟数据"""
-    data_dir = 'data/5min'
-    if not os.path.exists(data_dir):
-        return {}
-    
     latest_data = {}
     today = datetime.now().date()
     yesterday = today - timedelta(days=1)
     
-    for file in os.listdir(data_dir):
-        if file.endswith('.csv'):
-            symbol = file.split('_')[0]
-            file_path = os.path.join(data_dir, file)
-            df = pd.read_csv(file_path)
-            df['datetime'] = pd.to_datetime(df['datetime'])
-            # 只保留今天和昨天的数据
-            df = df[df['datetime'].dt.date >= yesterday]
-            if not df.empty:
-                latest_data[symbol] = df
+    for symbol in bar_store.symbols('5min'):
+        # 只保留今天和昨天的数据
+        df = bar_store.load(symbol, '5min', start=yesterday)
+        if not df.empty:
+            latest_data[symbol] = df
     
     return latest_data
 
-def process_latest_data(data_dict):
-    """处理最新数据并计算信号"""
-    results = {}
-    for symbol, df in data_dict.items():
-        golden_cross, death_cross = calculate_ema_signals(df)
-        results[symbol] = {
-            'golden_cross': golden_cross,
-            'death_cross': death_cross
-        }
-    return results
+def load_recent_signals():
+    """从信号库读取今天和昨天的5分钟信号"""
+    yesterday = datetime.now().date() - timedelta(days=1)
+    return signal_store.since('5min', yesterday)
 
 def format_signal_df(df, signal_type):
     """格式化信号数据框"""
@@ -62,13 +51,8 @@ def predict_cross_signals(data_dict):
         if len(df) < 30:  # 确保有足够的数据计算EMA
             continue
             
-        # 计算EMA
-        df['EMA8'] = talib.EMA(df['close'], timeperiod=8)
-        df['EMA21'] = talib.EMA(df['close'], timeperiod=21)
-        
-        # 计算斜率
-        df['EMA8_slope'] = df['EMA8'].diff(3) / 3
-        df['EMA21_slope'] = df['EMA21'].diff(3) / 3
+        # 计算EMA和斜率（与信号计算使用同一套指标定义，不修改传入的数据）
+        df = with_indicators(df, ['EMA8', 'EMA21', 'EMA8_slope', 'EMA21_slope'], symbol, '5min')
         
         # 获取最近5个数据点
         recent_data = df.tail(5)
@@ -139,7 +123,7 @@ def main():
     
     # 加载并处理数据
     data_dict = load_latest_data()
-    results = process_latest_data(data_dict)
+    signals = load_recent_signals()
     
     # 预测潜在信号
     potential_signals = predict_cross_signals(data_dict)
@@ -149,15 +133,9 @@ def main():
     
     with col1:
         st.subheader("金叉信号")
-        golden_signals = []
-        for symbol, data in results.items():
-            if not data['golden_cross'].empty:
-                df = data['golden_cross'].copy()
-                df['symbol'] = symbol
-                golden_signals.append(df)
+        golden_df = signals[signals['signal_type'] == '金叉']
         
-        if golden_signals:
-            golden_df = pd.concat(golden_signals)
+        if not golden_df.empty:
             golden_df = format_signal_df(golden_df, '金叉')
             st.dataframe(golden_df)
         else:
@@ -165,15 +143,9 @@ def main():
     
     with col2:
         st.subheader("死叉信号")
-        death_signals = []
-        for symbol, data in results.items():
-            if not data['death_cross'].empty:
-                df = data['death_cross'].copy()
-                df['symbol'] = symbol
-                death_signals.append(df)
+        death_df = signals[signals['signal_type'] == '死叉']
         
-        if death_signals:
-            death_df = pd.concat(death_signals)
+        if not death_df.empty:
             death_df = format_signal_df(death_df, '死叉')
             st.dataframe(death_df)
         else:
@@ -6,54 +6,173 @@ from datetime import datetime
 import os
 import signal
 import sys
-from get_futures_data import get_5min_data, get_all_futures_symbols
-from calculate_signals import calculate_ema_signals
+import threading
+import concurrent.futures
+from async_fetcher import DaemonThreadExecutor
+from get_futures_data import get_5min_data, get_all_futures_symbols, symbol_exchange
+from indicator_engine import IndicatorEngine
+from bar_builder import BarBuilder
+from signal_store import SignalStore
+from signal_journal import signal_journal
+from latency import latency
+from async_log import logger
+from state_snapshot import load_snapshot, save_snapshot
+from order_dispatcher import OrderDispatcher, PRIORITY_CLOSE, PRIORITY_OPEN
 from ctpbee import CtpbeeApi, CtpBee, helper
 from ctpbee.constant import Exchange, Direction, Offset, OrderType, Event
 
+# 市场检查周期（秒）和每个周期的截止时间，超时未取到数据的合约本周期跳过
+CHECK_INTERVAL = 60
+CHECK_DEADLINE = 45
+# 同时获取行情的线程数
+CHECK_WORKERS = 8
+# 持仓方向 -> 持仓记录中的方向
+DIRECTION_NAMES = {Direction.LONG: '多', Direction.SHORT: '空'}
+
 class LiveTradingApi(CtpbeeApi):
     def __init__(self, name):
         super().__init__(name)
         self.positions = {}  # 记录持仓状态
+        self.broker_positions = {}  # symbol -> {方向: 手数}，期货公司推送的持仓
+        self.unconfirmed = set()    # 从快照恢复、尚未与期货公司持仓核对的合约
+        self.consumed = {}  # symbol -> 最近一次已用于开仓的信号时间，同一个或更早的信号不再开仓
         self.take_profit_points = {
             'M2505': 1,  # 豆粕1个点=10元
             'RU2505': 5,  # 橡胶1个点=50元，对应5元价格变化
             'MA2505': 1  # 甲醇1个点=10元
         }
         self.inited = False
+        # 增量指标引擎，每个合约只处理新到的K线
+        self.engine = IndicatorEngine()
+        self.signal_store = SignalStore()
+        # tick合成的K线，5分钟K线收盘时在行情回调中直接计算信号
+        self.bar_builder = BarBuilder()
+        self.exchanges = {}  # symbol -> 行情中的交易所
+        # 委托经报单队列限速发出，平仓优先于开仓
+        self.dispatcher = OrderDispatcher(lambda req: self.action.send_order(req), account=name)
+        # 行情回调线程和定时检查线程共用指标引擎和持仓
+        self.lock = threading.RLock()
+        # 从快照恢复的合约，补齐快照之后的K线前不处理tick合成的K线
+        self.catching_up = set()
         self.symbols = get_all_futures_symbols()
-        print(f"初始化API，监控的合约列表: {self.symbols}")
+        logger.log("初始化API，监控的合约列表: {}", self.symbols)
+        self.restore_snapshot()
+
+    def restore_snapshot(self):
+        """从快照恢复指标状态和持仓，之后只需处理快照之后的K线"""
+        snapshot = load_snapshot()
+        if snapshot is None:
+            return
+        with self.lock:
+            self.engine.load_state(snapshot['engine'])
+            self.positions = snapshot['positions']
+            self.consumed = {symbol: pd.Timestamp(value) for symbol, value in snapshot.get('consumed', {}).items()}
+            # 快照之后可能已在别处平仓，初始化完成时与期货公司持仓核对
+            self.unconfirmed = set(self.positions)
+            self.catching_up = set(snapshot['engine'])
+
+    def reconcile_positions(self):
+        """用期货公司的持仓核对从快照恢复的持仓，对应方向没有持仓的删除"""
+        with self.lock:
+            for symbol in sorted(self.unconfirmed):
+                position = self.positions.get(symbol)
+                if position is None:
+                    continue
+                if self.broker_positions.get(symbol, {}).get(position['direction'], 0) > 0:
+                    logger.log("{} 快照中的{}仓与期货公司持仓一致", symbol, position['direction'])
+                    position['status'] = 'open'
+                else:
+                    logger.log("{} 快照中的{}仓在期货公司持仓中不存在，已删除", symbol, position['direction'])
+                    del self.positions[symbol]
+            self.unconfirmed.clear()
+
+    def save_snapshot(self):
+        """保存指标状态、最后处理的K线、持仓和已开仓的信号时间"""
+        with self.lock:
+            engine_state = self.engine.to_state()
+            positions = {symbol: dict(position) for symbol, position in self.positions.items()}
+            consumed = {symbol: value.isoformat() for symbol, value in self.consumed.items()}
+        try:
+            save_snapshot(engine_state, positions, consumed)
+        except Exception as e:
+            logger.log("保存状态快照失败: {}", e)
         
     def on_init(self, init: bool):
         """初始化完成回调"""
-        print(f"[{datetime.now()}] 交易接口初始化完成: {init}")
+        logger.log("交易接口初始化完成: {}", init)
+        # 初始化完成前期货公司已推送查询到的持仓
+        self.reconcile_positions()
         self.inited = True
         
         # 订阅合约行情
-        print(f"[{datetime.now()}] 开始订阅合约行情...")
+        logger.log("开始订阅合约行情...")
         for symbol in self.symbols:
             try:
                 req = helper.generate_market_request(
                     symbol=symbol,
-                    exchange=Exchange.SHFE  # 这里需要根据实际合约设置正确的交易所
+                    exchange=self.exchange_of(symbol)
                 )
-                self.app.subscribe(req)
-                print(f"[{datetime.now()}] 订阅合约 {symbol} 成功")
+                # ctpbee 1.8的请求中exchange已是交易所代码字符串，传入枚举的版本取其值
+                self.action.subscribe(f"{req.symbol}.{getattr(req.exchange, 'value', req.exchange)}")
+                logger.log("订阅合约 {} 成功", symbol)
             except Exception as e:
-                print(f"[{datetime.now()}] 订阅合约 {symbol} 失败: {e}")
+                logger.log("订阅合约 {} 失败: {}", symbol, e)
     
+    def exchange_of(self, symbol):
+        """合约的交易所：优先取行情中的值，其次按品种代码查表，都没有时默认上期所"""
+        exchange = self.exchanges.get(symbol)
+        if exchange is None:
+            code = symbol_exchange(symbol)
+            exchange = Exchange(code) if code else Exchange.SHFE
+        return exchange
+
     def on_tick(self, tick):
         """行情数据回调"""
-        print(f"[{datetime.now()}] 收到行情: {tick.symbol} 最新价: {tick.last_price} 买一: {tick.bid_price_1} 卖一: {tick.ask_price_1}")
+        # 行情只计数，后台线程定期输出汇总
+        logger.tick(tick.symbol, tick.last_price)
+        with self.lock:
+            self.exchanges[tick.symbol] = tick.exchange
+            closed = self.bar_builder.update_tick(tick.symbol, tick.datetime, tick.last_price, tick.volume,
+                                                  getattr(tick, 'open_interest', np.nan))
+            for minutes, bar in closed:
+                self.on_bar_close(tick.symbol, minutes, bar)
+
+    def close_due_bars(self):
+        """收盘没有后续tick的K线（如小节收盘、不活跃合约）"""
+        with self.lock:
+            for symbol, minutes, bar in self.bar_builder.close_due():
+                self.on_bar_close(symbol, minutes, bar)
+
+    def on_bar_close(self, symbol, minutes, bar):
+        """tick合成的K线收盘，5分钟K线收盘时更新指标并按新信号开仓"""
+        if minutes != 5 or not self.engine.seeded(symbol) or symbol in self.catching_up:
+            # 指标引擎由check_market用历史K线初始化或补齐
+            return
+        with latency.span('indicator_update', symbol):
+            signal = self.engine.update(symbol, bar['datetime'], bar['close'])
+        # K线时间为本地时间的收盘时刻
+        latency.record('bar_close_to_signal', (pd.Timestamp.now() - bar['datetime']).total_seconds(), symbol)
+        if signal is None:
+            return
+        logger.log("新信号: {} {} 时间:{} 价格:{}", symbol, signal['signal_type'], signal['datetime'], signal['close'])
+        self.signal_store.append('5min', symbol, [signal])
+        if self.open_position(symbol, signal):
+            latency.record('bar_close_to_order', (pd.Timestamp.now() - bar['datetime']).total_seconds(), symbol)
         
     def on_bar(self, bar):
         """K线数据回调"""
-        print(f"[{datetime.now()}] 收到K线: {bar.symbol} 开:{bar.open_price} 高:{bar.high_price} 低:{bar.low_price} 收:{bar.close_price}")
+        logger.log("收到K线: {} 开:{} 高:{} 低:{} 收:{}", bar.symbol, bar.open_price, bar.high_price, bar.low_price,
+                   bar.close_price)
         
     def on_trade(self, trade):
         """交易回报回调"""
-        print(f"[{datetime.now()}] 收到成交回报: 合约:{trade.symbol} 方向:{trade.direction} 开平:{trade.offset} 价格:{trade.price} 手数:{trade.volume}")
+        logger.log("收到成交回报: 合约:{} 方向:{} 开平:{} 价格:{} 手数:{}", trade.symbol, trade.direction, trade.offset,
+                   trade.price, trade.volume)
         if trade.offset == Offset.OPEN:
+            with self.lock:
+                position = self.positions.get(trade.symbol)
+                if position is not None:
+                    position['status'] = 'open'
             # 开仓成功后，立即下止盈单
             symbol = trade.symbol
             if symbol in self.take_profit_points:
@@ -66,94 +185,152 @@ class LiveTradingApi(CtpbeeApi):
                     take_profit_price = trade.price - take_profit_point
                     direction = Direction.LONG
                 
-                print(f"[{datetime.now()}] 开始设置止盈单: 合约:{symbol} 方向:{direction} 止盈价:{take_profit_price}")
+                logger.log("开始设置止盈单: 合约:{} 方向:{} 止盈价:{}", symbol, direction, take_profit_price)
                 # 下止盈单
-                req = helper.generate_order_req_by_var(
-                    symbol=symbol,
-                    exchange=trade.exchange,
-                    direction=direction,
-                    offset=Offset.CLOSE,
-                    type=OrderType.LIMIT,
-                    price=take_profit_price,
-                    volume=trade.volume
-                )
-                self.send_order(req)
-                print(f"[{datetime.now()}] 止盈单已发送")
+                self.send_limit_order(symbol, trade.exchange, direction, Offset.CLOSE, take_profit_price, trade.volume,
+                                      priority=PRIORITY_CLOSE)
+                logger.log("止盈单已提交")
+        else:
+            # 止盈（平仓）成交，该合约可以按新信号再次开仓
+            with self.lock:
+                position = self.positions.pop(trade.symbol, None)
+            if position is not None:
+                logger.log("{} 平仓成交，清除{}仓记录", trade.symbol, position['direction'])
     
     def on_order(self, order):
         """订单状态回调"""
-        print(f"[{datetime.now()}] 收到订单状态更新: 合约:{order.symbol} 方向:{order.direction} 开平:{order.offset} "
-              f"价格:{order.price} 手数:{order.volume} 状态:{order.status}")
+        self.dispatcher.on_order(order)
+        logger.log("收到订单状态更新: 合约:{} 方向:{} 开平:{} 价格:{} 手数:{} 状态:{}", order.symbol, order.direction,
+                   order.offset, order.price, order.volume, order.status)
     
     def on_position(self, position):
         """持仓更新回调"""
-        print(f"[{datetime.now()}] 收到持仓更新: 合约:{position.symbol} 方向:{position.direction} "
-              f"总仓:{position.volume} 可用:{position.available} 冻结:{position.frozen}")
+        logger.log("收到持仓更新: 合约:{} 方向:{} 总仓:{} 昨仓:{} 冻结:{}", position.symbol, position.direction,
+                   position.volume, position.yd_volume, position.frozen)
+        name = DIRECTION_NAMES.get(position.direction)
+        if name is None:
+            return
+        with self.lock:
+            self.broker_positions.setdefault(position.symbol, {})[name] = position.volume
+            if not self.inited and position.volume > 0 and position.symbol not in self.positions:
+                # 启动时查询到、本地没有记录的持仓（快照丢失或在别处开仓），补记后不再重复开仓。
+                # 初始化完成后持仓由开仓和平仓成交维护，不按推送补记，以免刚平仓又被旧推送补回
+                logger.log("{} 按期货公司持仓补记{}仓", position.symbol, name)
+                self.positions[position.symbol] = {'direction': name, 'entry_price': position.price, 'status': 'open'}
     
     def on_account(self, account):
         """账户资金更新回调"""
-        print(f"[{datetime.now()}] 收到账户更新: 余额:{account.balance} 可用:{account.available} "
-              f"冻结:{account.frozen} 持仓盈亏:{account.position_profit}")
+        logger.log("收到账户更新: 余额:{} 可用:{} 冻结:{} 持仓盈亏:{}", account.balance, account.available,
+                   account.frozen, account.position_profit)
+        
+    def send_limit_order(self, symbol, exchange, direction, offset, price, volume, priority=PRIORITY_OPEN,
+                         on_sent=None, on_failed=None):
+        """限价单放入报单队列，按流控限速发出，回调见OrderDispatcher.submit"""
+        req = helper.generate_order_req_by_var(
+            symbol=symbol,
+            exchange=exchange,
+            direction=direction,
+            offset=offset,
+            type=OrderType.LIMIT,
+            price=price,
+            volume=volume
+        )
+        self.dispatcher.submit(req, priority, on_sent, on_failed)
+
+    def open_position(self, symbol, signal):
+        """按金叉/死叉信号开仓，返回是否提交了开仓委托
+
+        已有持仓的合约不再开仓；每个信号只开仓一次，止盈平仓或开仓委托失败后，
+        同一个或更早的信号不会再次开仓，要等新的信号。
+        """
+        if not self.inited or symbol in self.positions:
+            return False
+        consumed = self.consumed.get(symbol)
+        if consumed is not None and signal['datetime'] <= consumed:
+            logger.log("{} {}的信号已开过仓，不再开仓", symbol, signal['datetime'])
+            return False
+        self.consumed[symbol] = pd.Timestamp(signal['datetime'])
+        if signal['signal_type'] == 'golden_cross':
+            direction, name, side, reason = Direction.LONG, '多', 'LONG', '5分钟金叉'
+        else:
+            direction, name, side, reason = Direction.SHORT, '空', 'SHORT', '5分钟死叉'
+
+        logger.log("准备开{}仓...", name)
+        # 委托发出前先占住该合约，发送失败或未成交被撤单/拒单时释放
+        self.positions[symbol] = {
+            'direction': name,
+            'entry_price': signal['close'],
+            'status': 'pending'
+        }
+
+        def on_sent(req, order_id):
+            logger.log("{}仓开仓委托已发出: {} 委托号:{}", name, symbol, order_id)
+            signal_journal.write({
+                'symbol': symbol,
+                'datetime': signal['datetime'],
+                'type': side,
+                'price': signal['close'],
+                'reason': reason,
+                'source': 'live_trading'
+            })
+
+        def on_failed(req, failure):
+            # 只释放占位，信号已记为处理过，不会重发；该合约等下一个新信号再开仓
+            with self.lock:
+                position = self.positions.get(symbol)
+                if position is not None and position.get('status') == 'pending':
+                    del self.positions[symbol]
+                    logger.log("{} 开仓委托失败（{}），释放持仓占位，等待新信号", symbol, failure)
+
+        self.send_limit_order(symbol, self.exchange_of(symbol), direction, Offset.OPEN,
+                              signal['close'], 1, on_sent=on_sent, on_failed=on_failed)
+        logger.log("{}仓开仓委托已提交", name)
+        return True
         
     def process_signals(self, df, symbol):
         """处理交易信号"""
         if not self.inited:
-            print(f"[{datetime.now()}] 交易接口未初始化完成，跳过信号处理")
+            logger.log("交易接口未初始化完成，跳过信号处理")
             return
             
-        print(f"[{datetime.now()}] 开始处理 {symbol} 的交易信号...")
-        golden_cross, death_cross = calculate_ema_signals(df)
-        
-        # 检查是否有新的金叉信号
-        if not golden_cross.empty:
-            latest_golden = golden_cross.iloc[-1]
-            print(f"[{datetime.now()}] 发现金叉信号: {symbol} 时间:{latest_golden['datetime']} 价格:{latest_golden['close']}")
-            if symbol not in self.positions:
-                print(f"[{datetime.now()}] 准备开多仓...")
-                # 开多仓
-                req = helper.generate_order_req_by_var(
-                    symbol=symbol,
-                    exchange=Exchange.SHFE,  # 根据实际交易所设置
-                    direction=Direction.LONG,
-                    offset=Offset.OPEN,
-                    type=OrderType.LIMIT,
-                    price=latest_golden['close'],
-                    volume=1
-                )
-                self.send_order(req)
-                print(f"[{datetime.now()}] 多仓开仓委托已发送")
-                self.positions[symbol] = {
-                    'direction': '多',
-                    'entry_price': latest_golden['close']
-                }
-        
-        # 检查是否有新的死叉信号
-        if not death_cross.empty:
-            latest_death = death_cross.iloc[-1]
-            print(f"[{datetime.now()}] 发现死叉信号: {symbol} 时间:{latest_death['datetime']} 价格:{latest_death['close']}")
-            if symbol not in self.positions:
-                print(f"[{datetime.now()}] 准备开空仓...")
-                # 开空仓
-                req = helper.generate_order_req_by_var(
-                    symbol=symbol,
-                    exchange=Exchange.SHFE,  # 根据实际交易所设置
-                    direction=Direction.SHORT,
-                    offset=Offset.OPEN,
-                    type=OrderType.LIMIT,
-                    price=latest_death['close'],
-                    volume=1
-                )
-                self.send_order(req)
-                print(f"[{datetime.now()}] 空仓开仓委托已发送")
-                self.positions[symbol] = {
-                    'direction': '空',
-                    'entry_price': latest_death['close']
-                }
+        logger.log("开始处理 {} 的交易信号...", symbol)
+        with self.lock:
+            times = pd.to_datetime(df['datetime'])
+            last = self.engine.last_datetime(symbol) if self.engine.seeded(symbol) else None
+            if last is not None and times.min() > last:
+                # 获取的数据与已处理的K线之间有缺口（快照太旧），重新初始化
+                logger.log("{} 数据从{}开始，晚于最后处理的K线{}，重新初始化指标", symbol, times.min(), last)
+                last = None
+            if last is None:
+                # 历史中的信号不是新信号，初始化时不开仓
+                self.engine.seed(symbol, df)
+                signals = []
+            else:
+                signals = self.engine.update_bars(symbol, df)
+                for signal in signals:
+                    logger.log("新信号: {} {} 时间:{} 价格:{}", symbol, signal['signal_type'], signal['datetime'], signal['close'])
+                if signals:
+                    self.signal_store.append('5min', symbol, signals)
+            self.catching_up.discard(symbol)
+            
+            # 只按本次新产生的信号开仓，补齐多根K线时以最新的信号为准
+            if signals:
+                self.open_position(symbol, signals[-1])
 
 class LiveTrading:
     def __init__(self):
         self.running = True
-        print(f"[{datetime.now()}] 开始初始化交易系统...")
+        logger.log("开始初始化交易系统...")
+        # 市场检查：有界线程池获取行情，上一周期未结束时跳过本周期。卡住的请求
+        # 在守护线程中，退出时不会被等待
+        self.executor = DaemonThreadExecutor(max_workers=CHECK_WORKERS, thread_name_prefix='check_market')
+        self.check_lock = threading.Lock()
+        self.fetching = {}  # symbol -> 尚未完成的获取（超时后仍在运行）
+        # 调度线程和检查周期线程都会更新的统计，用stats_lock保护
+        self.stats_lock = threading.Lock()
+        self.cycles = 0
+        self.overruns = 0   # 超过检查周期或因上一周期未结束而跳过的次数
+        self.dropped = 0    # 超过截止时间被跳过的合约数
         
         # 初始化CTP接口
         self.app = CtpBee("live_trading", __name__)
@@ -173,12 +350,12 @@ class LiveTrading:
             "XMIN": [5],         # 订阅5分钟K线
             "LOOPER_METHOD": "thread"
         })
-        print(f"[{datetime.now()}] CTP接口配置完成")
+        logger.log("CTP接口配置完成")
         
         # 创建API并添加到app
         self.api = LiveTradingApi("live_trading_api")
         self.app.add_extension(self.api)
-        print(f"[{datetime.now()}] API实例创建完成")
+        logger.log("API实例创建完成")
         
         # 注册信号处理
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -186,52 +363,125 @@ class LiveTrading:
         
         # 启动连接
         self.app.start()
-        print(f"[{datetime.now()}] CTP连接已启动")
+        logger.log("CTP连接已启动")
         
         # 等待初始化完成
-        print(f"[{datetime.now()}] 等待交易接口初始化...")
+        logger.log("等待交易接口初始化...")
         while not self.api.inited and self.running:
             time.sleep(1)
             
         if self.running:
-            print(f"[{datetime.now()}] 交易接口初始化完成")
+            logger.log("交易接口初始化完成")
         else:
-            print(f"[{datetime.now()}] 初始化过程被中断")
+            logger.log("初始化过程被中断")
     
     def signal_handler(self, signum, frame):
         """信号处理函数"""
         print(f"\n[{datetime.now()}] 收到退出信号，开始安全退出...")
         self.running = False
     
-    def check_market(self):
-        """每分钟检查市场"""
-        print(f"\n[{datetime.now()}] 开始检查市场...")
-        
+    def fetch_5min_data(self, symbol):
+        with latency.span('get_5min_data', symbol):
+            return get_5min_data(symbol)
+
+    def count_overrun(self):
+        with self.stats_lock:
+            self.overruns += 1
+            return self.overruns
+
+    def start_check_market(self):
+        """定时任务入口：在后台线程执行市场检查，不阻塞K线收盘等其他定时任务"""
+        if self.check_lock.locked():
+            logger.log("上一周期市场检查尚未结束，跳过本周期（累计{}次）", self.count_overrun())
+            return
+        threading.Thread(target=self.check_market, name='check_market_cycle', daemon=True).start()
+
+    def check_market(self, deadline=CHECK_DEADLINE):
+        """检查市场：并发获取各合约5分钟数据，哪个合约先取到就先处理信号
+
+        同一时间只有一个周期在执行；截止时间到时仍未取到的合约本周期跳过，
+        其获取仍在运行时下一周期也不再重复提交。信号在本线程处理。
+        """
+        if not self.check_lock.acquire(blocking=False):
+            logger.log("上一周期市场检查尚未结束，跳过本周期（累计{}次）", self.count_overrun())
+            return
+        try:
+            self._check_market(deadline)
+        finally:
+            self.check_lock.release()
+
+    def _check_market(self, deadline):
+        start = time.monotonic()
+        logger.log("开始检查市场...")
+
+        futures = {}  # future -> symbol
         for symbol in self.api.symbols:
-            if not self.running:
-                print(f"[{datetime.now()}] 市场检查被中断")
-                break
-                
-            try:
-                # 获取5分钟数据
-                print(f"[{datetime.now()}] 获取 {symbol} 的5分钟数据...")
-                df = get_5min_data(symbol)
-                if df is not None and not df.empty:
-                    # 处理交易信号
-                    self.api.process_signals(df, symbol)
-            except Exception as e:
-                print(f"[{datetime.now()}] 处理{symbol}时出错: {e}")
+            pending = self.fetching.get(symbol)
+            if pending is not None and not pending.done():
+                continue
+            future = self.fetching[symbol] = self.executor.submit(self.fetch_5min_data, symbol)
+            futures[future] = symbol
+
+        # 按完成顺序处理，一个慢合约不耽误其他合约的信号和下单
+        processed = set()
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=max(0.0, deadline - (time.monotonic() - start))):
+                if not self.running:
+                    logger.log("市场检查被中断")
+                    break
+                symbol = futures[future]
+                processed.add(symbol)
+                try:
+                    df = future.result()
+                    if df is not None and not df.empty:
+                        # 处理交易信号
+                        with latency.span('process_signals', symbol):
+                            self.api.process_signals(df, symbol)
+                except Exception as e:
+                    logger.log("处理{}时出错: {}", symbol, e)
+        except concurrent.futures.TimeoutError:
+            pass
+        late = [symbol for symbol in futures.values() if symbol not in processed]
+
+        elapsed = time.monotonic() - start
+        with self.stats_lock:
+            self.cycles += 1
+            self.dropped += len(late)
+            if elapsed > CHECK_INTERVAL:
+                self.overruns += 1
+            cycles, overruns = self.cycles, self.overruns
+        latency.record('check_market', elapsed)
+        skipped = len(self.api.symbols) - len(futures)
+        logger.log("市场检查完成: 耗时{:.1f}秒 处理{}个合约 超时{}个 上周期未完成跳过{}个 累计周期{} 超时周期{}",
+                   elapsed, len(processed), len(late), skipped, cycles, overruns)
+        if late:
+            logger.log("超过截止时间的合约: {}", late)
     
+    def log_order_stats(self):
+        stats = self.api.dispatcher.stats()
+        logger.log("报单队列: 排队{} 最大排队{} 在途{} 已发{} 失败{} 排队耗时p50 {} p99 {}", stats['queue_depth'],
+                   stats['max_queue_depth'], stats['in_flight'], stats['sent'], stats['failed'], stats['dispatch_p50'],
+                   stats['dispatch_p99'])
+
     def run(self):
         """运行交易系统"""
-        print(f"[{datetime.now()}] 启动自动交易系统...")
+        logger.log("启动自动交易系统...")
         
         # 等待交易接口完全连接
         time.sleep(5)
         
         # 设置定时任务，每分钟执行一次
-        schedule.every(1).minutes.do(self.check_market)
-        print(f"[{datetime.now()}] 定时任务设置完成")
+        schedule.every(CHECK_INTERVAL).seconds.do(self.start_check_market)
+        # tick合成的K线到点收盘（收盘后没有新tick的合约）
+        schedule.every(1).seconds.do(self.api.close_due_bars)
+        # 定期导出各阶段耗时统计
+        schedule.every(30).seconds.do(latency.export)
+        # 定期保存状态快照，重启时从快照恢复
+        schedule.every(30).seconds.do(self.api.save_snapshot)
+        schedule.every(30).seconds.do(self.log_order_stats)
+        logger.log("定时任务设置完成")
+        # 启动后立即检查一次，从快照恢复时尽快补齐快照之后的K线
+        self.start_check_market()
         
         # 运行定时任务
         while self.running:
@@ -239,9 +489,15 @@ class LiveTrading:
             time.sleep(1)
             
         # 安全退出
-        print(f"[{datetime.now()}] 开始清理资源...")
+        logger.log("开始清理资源...")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.api.dispatcher.close()
+        self.api.save_snapshot()
+        signal_journal.close()
+        latency.export()
         self.app.release()
-        print(f"[{datetime.now()}] 交易系统已安全退出")
+        logger.log("交易系统已安全退出")
+        logger.close()
 
 if __name__ == "__main__":
     trader = LiveTrading()
@@ -0,0 +1,175 @@
+import numpy as np
+import heapq
+import itertools
+import threading
+import time
+from rate_limit import TokenBucket
+from async_log import logger
+from latency import latency, LatencyRing
+
+# 报单流控：每秒报单数和允许的突发数（SimNow/多数期货公司为每秒6笔）
+ORDER_RATE = 5
+ORDER_BURST = 5
+# 平仓（含止盈）优先于开仓
+PRIORITY_CLOSE = 0
+PRIORITY_OPEN = 1
+
+class OrderDispatcher:
+    """一个账户的报单队列：按优先级排队，按令牌桶限速发出，跟踪在途委托
+
+    submit()只入队不阻塞；后台线程按 (优先级, 入队顺序) 取出委托，在令牌桶
+    允许时调用send(req)发出，send返回的本地委托号记入在途委托。on_order按
+    委托号更新状态，成交、撤单、拒单后移除。发出后调用on_sent(req, 委托号)；
+    发送出错、没有返回委托号、或未成交就撤单/拒单时调用on_failed(req, 原因)，
+    两个回调都在报单线程或回报线程中执行。
+    """
+
+    # ctpbee Status的取值
+    TERMINAL_STATUSES = ('全部成交', '已撤销', '拒单')
+    FAILED_STATUSES = ('已撤销', '拒单')
+    FILLED_STATUS = '全部成交'
+
+    def __init__(self, send, account='default', rate=ORDER_RATE, capacity=ORDER_BURST):
+        self.send = send
+        self.account = account
+        self.bucket = TokenBucket(rate, capacity)
+        self.queue = []  # (priority, seq, 入队时刻, req, on_sent, on_failed)
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.in_flight = {}  # 本地委托号 -> 委托信息
+        self.early = {}      # 发出前已收到回报的委托号 -> (状态, 已成交手数)
+        self.running = True
+        self.thread = None
+        self.sent = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.dispatch_latency = LatencyRing()
+
+    def start(self):
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f'order_dispatcher_{self.account}', daemon=True)
+                self.thread.start()
+
+    def submit(self, req, priority=PRIORITY_OPEN, on_sent=None, on_failed=None):
+        """委托入队，立即返回"""
+        if self.thread is None:
+            self.start()
+        with self.cond:
+            heapq.heappush(self.queue, (priority, next(self.seq), time.perf_counter(), req, on_sent, on_failed))
+            self.max_depth = max(self.max_depth, len(self.queue))
+            self.cond.notify()
+
+    def _next(self):
+        """等到有委托且有令牌时取出一个，停止且队列为空时返回None"""
+        with self.cond:
+            while True:
+                if not self.queue:
+                    if not self.running:
+                        return None
+                    self.cond.wait()
+                    continue
+                wait = self.bucket.wait_time()
+                if wait > 0:
+                    self.cond.wait(wait)
+                    continue
+                self.bucket.consume()
+                return heapq.heappop(self.queue)
+
+    def _callback(self, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.log("报单回调出错: {} {}", args[0].symbol, e)
+
+    def _fail(self, req, on_failed, reason):
+        with self.cond:
+            self.failed += 1
+        logger.log("委托失败: {} {}", req.symbol, reason)
+        self._callback(on_failed, req, reason)
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            priority, _, queued, req, on_sent, on_failed = item
+            start = time.perf_counter()
+            try:
+                order_id = self.send(req)
+            except Exception as e:
+                self._fail(req, on_failed, f"发送出错: {e}")
+                continue
+            sent = time.perf_counter()
+            self.dispatch_latency.record(sent - queued)
+            latency.record('order_dispatch', sent - queued, req.symbol)
+            latency.record('send_order', sent - start, req.symbol)
+            if not order_id:
+                self._fail(req, on_failed, "没有返回委托号")
+                continue
+            with self.cond:
+                self.sent += 1
+                status, traded = self.early.pop(order_id, (None, 0))
+                if status not in self.TERMINAL_STATUSES:
+                    self.in_flight[order_id] = {
+                        'symbol': req.symbol,
+                        'priority': priority,
+                        'sent': sent,
+                        'status': status,
+                        'req': req,
+                        'on_failed': on_failed
+                    }
+            self._callback(on_sent, req, order_id)
+            if status == self.FILLED_STATUS:
+                # send返回前已全部成交，耗时不超过send本身
+                latency.record('order_to_trade', sent - start, req.symbol)
+            elif status in self.FAILED_STATUSES and not traded:
+                self._fail(req, on_failed, status)
+
+    def on_order(self, order):
+        """委托回报：更新在途委托状态，终结状态时移除"""
+        order_id = order.local_order_id
+        status = getattr(order.status, 'value', order.status)
+        traded = getattr(order, 'traded', 0)
+        with self.cond:
+            entry = self.in_flight.get(order_id)
+            if entry is None:
+                # 回报先于send返回到达，或不是本队列发出的委托
+                if len(self.early) > 1000:
+                    self.early.clear()
+                self.early[order_id] = (status, traded)
+                return
+            if status in self.TERMINAL_STATUSES:
+                del self.in_flight[order_id]
+            else:
+                entry['status'] = status
+        if status == self.FILLED_STATUS:
+            # 从委托发出（而不是入队）开始计算
+            latency.record('order_to_trade', time.perf_counter() - entry['sent'], entry['symbol'])
+        elif status in self.FAILED_STATUSES and not traded:
+            self._fail(entry['req'], entry['on_failed'], status)
+
+    def stats(self):
+        samples = self.dispatch_latency.samples()
+        with self.cond:
+            return {
+                'account': self.account,
+                'queue_depth': len(self.queue),
+                'max_queue_depth': self.max_depth,
+                'in_flight': len(self.in_flight),
+                'sent': self.sent,
+                'failed': self.failed,
+                'dispatch_p50': float(np.percentile(samples, 50)) if len(samples) else None,
+                'dispatch_p99': float(np.percentile(samples, 99)) if len(samples) else None,
+                'dispatch_max': float(samples.max()) if len(samples) else None
+            }
+
+    def close(self, timeout=5):
+        """发完已入队的委托后停止（最多等待timeout秒）"""
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
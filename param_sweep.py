@@ -0,0 +1,208 @@
+import pandas as pd
+import numpy as np
+import talib
+import time
+import argparse
+from backtest import Backtest, bar_store, backtest_symbols
+
+def load_bars(symbol, timeframe='5min'):
+    """从K线存储加载指定周期的K线数据"""
+    return bar_store.load(symbol, timeframe)
+
+def ema_matrix(close, periods):
+    """一次计算多个周期的EMA，每个周期一列"""
+    close = np.asarray(close, dtype=float)
+    return np.column_stack([talib.EMA(close, timeperiod=p) for p in periods])
+
+def cross_signal_matrices(close, pairs, angles):
+    """计算所有参数组合的金叉死叉信号
+
+    pairs为(快线周期, 慢线周期)列表，angles为角度阈值。返回两个形状为
+    (K线数, 均线组合数, 角度数)的布尔数组，与calculate_ema_signals的口径一致。
+    """
+    periods = sorted({p for pair in pairs for p in pair})
+    column = {p: i for i, p in enumerate(periods)}
+    fast_idx = [column[fast] for fast, _ in pairs]
+    slow_idx = [column[slow] for _, slow in pairs]
+
+    ema = ema_matrix(close, periods)
+
+    # 金叉死叉：快线在慢线之上为1，否则为-1
+    cross = np.where(ema[:, fast_idx] > ema[:, slow_idx], 1, -1)
+    cross_change = np.zeros(cross.shape)
+    cross_change[1:] = np.diff(cross, axis=0)
+
+    # 斜率与角度，对应diff(3) / 3
+    slope = np.full(ema.shape, np.nan)
+    slope[3:] = (ema[3:] - ema[:-3]) / 3
+    angle_degrees = np.degrees(np.arctan2(slope[:, fast_idx] - slope[:, slow_idx], 1))
+
+    angles = np.asarray(angles, dtype=float)
+    golden = (cross_change == 2)[:, :, None] & (angle_degrees[:, :, None] > angles)
+    death = (cross_change == -2)[:, :, None] & (angle_degrees[:, :, None] < -angles)
+    return golden, death
+
+# 向量化查找时单个窗口矩阵（信号数 x 窗口宽度 x 阈值数）的元素上限
+MAX_WINDOW_CELLS = 1 << 22
+# 参数扫描时单个收益块（信号数 x 均线组合数 x 角度数 x 止盈数）的元素上限
+MAX_CHUNK_CELLS = 1 << 22
+
+def first_hits(values, starts, thresholds):
+    """对每个起点查找之后第一个不低于对应阈值的K线位置，未触及返回-1
+
+    starts形状为(起点数,)，thresholds形状为(起点数, 阈值数)。所有起点同时按
+    倍增窗口向后扫描：窗口内取累计最大值，它是单调的，小于阈值的个数就是
+    searchsorted(side='left')的结果。查找不高于阈值的位置时传入取负的数组。
+    """
+    values = np.asarray(values, dtype=float)
+    starts = np.asarray(starts)
+    thresholds = np.asarray(thresholds, dtype=float)
+    hits = np.full(thresholds.shape, -1)
+    offset = np.zeros(len(starts), dtype=int)
+    pending = np.flatnonzero(starts < len(values))
+    width = 64
+    while pending.size:
+        span = max(1, min(width, MAX_WINDOW_CELLS // (pending.size * thresholds.shape[1])))
+        pos = starts[pending] + offset[pending]
+        idx = pos[:, None] + np.arange(span)
+        window = np.where(idx < len(values), values[np.minimum(idx, len(values) - 1)], -np.inf)
+        extreme = np.maximum.accumulate(window, axis=1)
+        count = (extreme[:, :, None] < thresholds[pending][:, None, :]).sum(axis=1)
+        found = (count < span) & (hits[pending] < 0)
+        rows, cols = np.nonzero(found)
+        hits[pending[rows], cols] = pos[rows] + count[rows, cols]
+        offset[pending] += span
+        # 所有阈值都已触及或已扫描到末尾的起点不再继续
+        done = (hits[pending] >= 0).all(axis=1) | (pos + span >= len(values))
+        pending = pending[~done]
+        width *= 2
+    return hits
+
+def trade_outcomes(signal_times, min_data, take_profits, contract_multiplier=10):
+    """计算每个信号在各止盈点数下做多和做空的收益
+
+    与Backtest一致：在信号后的第一根1分钟K线收盘价入场，之后第一根触及
+    止盈价的K线平仓，都未触及则以最后一根K线收盘价平仓。早于第一根1分钟K线
+    的信号同样在第一根K线入场。返回(long_pnl, short_pnl, valid)，收益数组
+    形状为(信号数, 止盈数)，valid标记入场后还有K线、能够评估的信号。
+    """
+    times = min_data['datetime'].to_numpy(dtype='datetime64[ns]')
+    high = np.nan_to_num(min_data['high'].to_numpy(dtype=float), nan=-np.inf)
+    low = np.nan_to_num(min_data['low'].to_numpy(dtype=float), nan=np.inf)
+    close = min_data['close'].to_numpy(dtype=float)
+    take_profits = np.asarray(take_profits, dtype=float)
+
+    long_pnl = np.zeros((len(signal_times), len(take_profits)))
+    short_pnl = np.zeros((len(signal_times), len(take_profits)))
+
+    entry_idx = np.searchsorted(times, signal_times, side='right')
+    valid = entry_idx < len(times)
+    exit_start = np.searchsorted(times, times[np.minimum(entry_idx, len(times) - 1)], side='right')
+    valid &= exit_start < len(times)
+
+    rows = np.flatnonzero(valid)
+    entry_price = close[entry_idx[rows]][:, None]
+    start = exit_start[rows]
+
+    long_price = entry_price + take_profits
+    long_hits = first_hits(high, start, long_price)
+    long_pnl[rows] = (np.where(long_hits >= 0, long_price, close[-1]) - entry_price) * contract_multiplier
+
+    short_price = entry_price - take_profits
+    short_hits = first_hits(-low, start, -short_price)
+    short_pnl[rows] = (entry_price - np.where(short_hits >= 0, short_price, close[-1])) * contract_multiplier
+
+    return long_pnl, short_pnl, valid
+
+def sweep_bars(bars, min_data, fast_periods, slow_periods, angles, take_profits,
+               initial_capital=100000, contract_multiplier=10):
+    """在已加载的K线上评估所有参数组合，返回按总收益排序的结果表
+
+    收益按均线组合分块计算，每块算完即汇总，内存占用不随组合数增长。
+    """
+    pairs = [(fast, slow) for fast in fast_periods for slow in slow_periods if fast < slow]
+    if not pairs:
+        return pd.DataFrame()
+
+    golden, death = cross_signal_matrices(bars['close'].to_numpy(dtype=float), pairs, angles)
+
+    # 只对至少在一个组合中出现信号的K线计算交易结果
+    rows = np.flatnonzero(golden.any(axis=(1, 2)) | death.any(axis=(1, 2)))
+    signal_times = bars['datetime'].to_numpy(dtype='datetime64[ns]')[rows]
+    long_pnl, short_pnl, valid = trade_outcomes(signal_times, min_data, take_profits, contract_multiplier)
+    golden = golden[rows] & valid[:, None, None]
+    death = death[rows] & valid[:, None, None]
+
+    shape = (len(pairs), len(angles), len(take_profits))
+    total_profit = np.zeros(shape)
+    max_drawdown = np.zeros(shape)
+    wins = np.zeros(shape, dtype=int)
+    total_trades = np.zeros(shape, dtype=int)
+
+    chunk = max(1, MAX_CHUNK_CELLS // max(1, len(rows) * len(angles) * len(take_profits)))
+    for lo in range(0, len(pairs), chunk):
+        part = slice(lo, lo + chunk)
+        # 每个信号在每个组合下的收益：(信号, 均线组合, 角度, 止盈)
+        pnl = golden[:, part, :, None] * long_pnl[:, None, None, :]
+        pnl += death[:, part, :, None] * short_pnl[:, None, None, :]
+        traded = (golden[:, part] | death[:, part])[..., None]
+        total_profit[part] = pnl.sum(axis=0)
+        wins[part] = ((pnl > 0) & traded).sum(axis=0)
+        total_trades[part] = traded.sum(axis=0)
+
+        equity = np.cumsum(pnl, axis=0, out=pnl)
+        equity += initial_capital
+        peak = np.maximum(np.maximum.accumulate(equity, axis=0), initial_capital)
+        max_drawdown[part] = (peak - equity).max(axis=0, initial=0)
+
+    pair_idx, angle_idx, tp_idx = np.indices(shape).reshape(3, -1)
+    pairs = np.asarray(pairs)
+    results = pd.DataFrame({
+        'fast': pairs[pair_idx, 0],
+        'slow': pairs[pair_idx, 1],
+        'angle': np.asarray(angles)[angle_idx],
+        'take_profit': np.asarray(take_profits)[tp_idx],
+        'total_profit': total_profit.ravel(),
+        'profit_pct': total_profit.ravel() / initial_capital * 100,
+        'total_trades': total_trades.ravel(),
+        'win_rate': np.divide(wins.ravel(), total_trades.ravel(),
+                              out=np.zeros(wins.size), where=total_trades.ravel() > 0),
+        'max_drawdown': max_drawdown.ravel()
+    })
+    results = results.sort_values('total_profit', ascending=False, kind='stable').reset_index(drop=True)
+    results.index += 1
+    results.index.name = 'rank'
+    return results
+
+def run_sweep(symbol, fast_periods=range(5, 13), slow_periods=range(15, 35, 4),
+              angles=(0, 5, 10, 15, 20), take_profits=(1, 2, 3, 5, 8), timeframe='5min'):
+    """加载品种数据一次，评估整个参数网格"""
+    backtest = Backtest()
+    bars = load_bars(symbol, timeframe)
+    min_data = backtest.load_1min_data(symbol)
+    return sweep_bars(bars, min_data, fast_periods, slow_periods, angles, take_profits,
+                      initial_capital=backtest.initial_capital,
+                      contract_multiplier=backtest.contract_multiplier)
+
+def main():
+    parser = argparse.ArgumentParser(description='EMA参数扫描')
+    parser.add_argument('--symbols', nargs='+', help='要扫描的品种，默认为信号表中的全部品种')
+    args = parser.parse_args()
+
+    symbols = backtest_symbols(args.symbols)
+
+    for symbol in symbols:
+        print(f"\n开始参数扫描 {symbol}...")
+        start = time.time()
+        try:
+            results = run_sweep(symbol)
+        except Exception as e:
+            print(f"参数扫描 {symbol} 时出错: {e}")
+            continue
+
+        print(f"共评估 {len(results)} 组参数，耗时 {time.time() - start:.2f} 秒")
+        print(results.head(10).to_string())
+        results.to_csv(f'sweep_{symbol}.csv', encoding='utf-8-sig')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+    """令牌桶限速器：平均每秒rate个请求，允许capacity个突发请求
+
+    同步代码用take()阻塞等待令牌，协程中用acquire()；两者线程安全，同一个
+    令牌桶可以在多个线程和事件循环之间共享。自己管理锁和等待的调用方
+    （如报单队列）直接用wait_time()和consume()，由调用方加锁。
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait_time(self):
+        """补充令牌，返回还需等待的秒数，有令牌时返回0"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def try_acquire(self):
+        """有令牌时取走一个并返回0，否则返回还需等待的秒数"""
+        with self.lock:
+            wait = self.wait_time()
+            if wait == 0:
+                self.consume()
+            return wait
+
+    def take(self):
+        """阻塞等待直到取得一个令牌"""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    async def acquire(self):
+        """等待直到取得一个令牌，等待时不阻塞事件循环"""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+from file_lock import FileLock
+
+JOURNAL_DIR = 'signals'
+JOURNAL_NAME = 'trend_signals'
+
+class SignalJournal:
+    """缓冲写入的信号日志（JSON Lines，按日期分文件）
+
+    信号先放在内存中，攒够max_batch条或距第一条超过max_delay秒时一次写入。
+    每批用一次O_APPEND写入并持有文件锁，多个进程同时写同一个文件不会交错。
+    每条记录独占一行，进程崩溃只可能留下最后一行不完整，下次写入前会先补上
+    换行，读取时跳过不完整的行。文件为 {directory}/{name}_YYYYMMDD.jsonl。
+    """
+
+    def __init__(self, name=JOURNAL_NAME, directory=JOURNAL_DIR, max_batch=64, max_delay=1.0):
+        self.name = name
+        self.directory = directory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.buffer = []  # [(日期, 已编码的一行)]
+        self.first_buffered = None
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher = None
+        atexit.register(self.close)
+
+    def path(self, date):
+        return os.path.join(self.directory, f'{self.name}_{date}.jsonl')
+
+    def write(self, record):
+        """记录一条信号，达到条数上限时立即写入"""
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self.lock:
+            if not self.buffer:
+                self.first_buffered = time.monotonic()
+            self.buffer.append((datetime.now().strftime('%Y%m%d'), line.encode('utf-8')))
+            full = len(self.buffer) >= self.max_batch
+            # 第一次写入时才启动定时写入线程
+            if self.flusher is None and not self.closed.is_set():
+                self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self.flusher.start()
+        if full or self.closed.is_set():
+            self.flush()
+
+    def _flush_loop(self):
+        while not self.closed.wait(self.max_delay / 2):
+            with self.lock:
+                due = self.buffer and time.monotonic() - self.first_buffered >= self.max_delay
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"写入信号日志时出错: {e}")
+
+    def flush(self):
+        """把缓冲的信号写入文件"""
+        with self.flush_lock:
+            with self.lock:
+                pending, self.buffer = self.buffer, []
+            if not pending:
+                return
+
+            batches = {}
+            for date, line in pending:
+                batches.setdefault(date, []).append(line)
+
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory, exist_ok=True)
+            for date, lines in batches.items():
+                self._append(self.path(date), b''.join(lines))
+
+    def _append(self, path, data):
+        with FileLock(f'{path}.lock'):
+            fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                # 上次写入中断留下的半行单独成行，不影响本批记录
+                size = os.fstat(fd).st_size
+                if size:
+                    os.lseek(fd, size - 1, os.SEEK_SET)
+                    if os.read(fd, 1) != b'\n':
+                        data = b'\n' + data
+                while data:
+                    written = os.write(fd, data)
+                    data = data[written:]
+            finally:
+                os.close(fd)
+
+    def close(self):
+        """停止后台线程并写入剩余的信号"""
+        self.closed.set()
+        self.flush()
+
+signal_journal = SignalJournal()
+
+def read_journal(date=None, name=JOURNAL_NAME, directory=JOURNAL_DIR):
+    """读取某一天的信号日志，跳过不完整或损坏的行"""
+    date = date or datetime.now().strftime('%Y%m%d')
+    path = os.path.join(directory, f'{name}_{date}.jsonl')
+    if not os.path.exists(path):
+        return []
+
+    records = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
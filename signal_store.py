@@ -0,0 +1,181 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import sqlite3
+import threading
+
+SIGNAL_DB = 'signals/signals.db'
+DASHBOARD_FILE = 'ui/public/signals.json'
+# 增量引擎输出的信号类型
+ENGINE_SIGNAL_TYPES = {'golden_cross': '金叉', 'death_cross': '死叉'}
+COLUMNS = ['datetime', 'close', 'EMA8', 'EMA21', 'angle_degrees', 'signal_type', 'symbol']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS signals (
+    timeframe TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    datetime INTEGER NOT NULL,
+    close REAL,
+    ema8 REAL,
+    ema21 REAL,
+    angle_degrees REAL,
+    signal_type TEXT NOT NULL,
+    PRIMARY KEY (timeframe, symbol, datetime)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS signals_by_time ON signals (timeframe, datetime);
+'''
+
+SELECT = 'SELECT datetime, close, ema8, ema21, angle_degrees, signal_type, symbol FROM signals'
+
+class SignalStore:
+    """按 (周期, 品种, 时间) 索引的信号库（SQLite）
+
+    主键即索引，"某品种最近N个信号"和"前一个/当前信号"只需沿索引读几行；
+    另有 (周期, 时间) 索引用于"某时间之后的所有信号"。datetime存为纳秒时间戳。
+    """
+
+    def __init__(self, path=SIGNAL_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        # fork出的子进程不能沿用父进程的连接
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+    def _query(self, sql, params):
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        df['datetime'] = pd.to_datetime(df['datetime'].to_numpy(dtype=np.int64), unit='ns')
+        return df
+
+    def merge(self, timeframe, table, symbols=None):
+        """合并信号管道计算出的信号表，返回写入的信号数
+
+        信号管道每次从完整历史重新计算，只有最后一根K线可能被修正，所以每个
+        品种只替换库中最后一个信号及之后的部分。symbols为本次处理过的品种，
+        用于删除被修正掉的信号，默认取表中出现的品种。
+        """
+        if symbols is None:
+            symbols = table['symbol'].astype(str).unique()
+        times = table['datetime'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        table_symbols = table['symbol'].astype(str).to_numpy()
+
+        written = 0
+        with self.lock, self.conn as conn:
+            for symbol in symbols:
+                row = conn.execute('SELECT MAX(datetime) FROM signals WHERE timeframe = ? AND symbol = ?',
+                                   (timeframe, symbol)).fetchone()
+                last = row[0] if row[0] is not None else np.iinfo(np.int64).min
+                conn.execute('DELETE FROM signals WHERE timeframe = ? AND symbol = ? AND datetime >= ?',
+                             (timeframe, symbol, last))
+                rows = np.flatnonzero((table_symbols == symbol) & (times >= last))
+                conn.executemany(
+                    'INSERT OR REPLACE INTO signals VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(timeframe, symbol, int(times[i]), float(table['close'].iat[i]), float(table['EMA8'].iat[i]),
+                      float(table['EMA21'].iat[i]), float(table['angle_degrees'].iat[i]), str(table['signal_type'].iat[i]))
+                     for i in rows])
+                written += len(rows)
+        return written
+
+    def append(self, timeframe, symbol, signals):
+        """追加增量指标引擎产生的信号（IndicatorEngine.update的返回值）"""
+        rows = [(timeframe, symbol, pd.Timestamp(signal['datetime']).value, float(signal['close']),
+                 float(signal['EMA8']), float(signal['EMA21']), float(signal['angle_degrees']),
+                 ENGINE_SIGNAL_TYPES.get(signal['signal_type'], signal['signal_type']))
+                for signal in signals]
+        with self.lock, self.conn as conn:
+            conn.executemany('INSERT OR REPLACE INTO signals VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def signals(self, timeframe, symbol):
+        """某品种的全部信号，按时间正序"""
+        return self._query(f'{SELECT} WHERE timeframe = ? AND symbol = ? ORDER BY datetime', (timeframe, symbol))
+
+    def latest(self, timeframe, symbol, n=1):
+        """某品种最近n个信号，按时间倒序"""
+        return self._query(f'{SELECT} WHERE timeframe = ? AND symbol = ? ORDER BY datetime DESC LIMIT ?',
+                           (timeframe, symbol, n))
+
+    def since(self, timeframe, start, symbol=None):
+        """start之后（含）的所有信号，按时间倒序"""
+        start = pd.Timestamp(start).value
+        if symbol is None:
+            return self._query(f'{SELECT} WHERE timeframe = ? AND datetime >= ? ORDER BY datetime DESC',
+                               (timeframe, start))
+        return self._query(f'{SELECT} WHERE timeframe = ? AND symbol = ? AND datetime >= ? ORDER BY datetime DESC',
+                           (timeframe, symbol, start))
+
+    def symbols(self, timeframe):
+        with self.lock:
+            rows = self.conn.execute('SELECT DISTINCT symbol FROM signals WHERE timeframe = ? ORDER BY symbol',
+                                     (timeframe,)).fetchall()
+        return [row[0] for row in rows]
+
+    def previous_current(self, timeframe, symbols=None):
+        """每个品种的前一个信号和当前（最新）信号
+
+        返回 {symbol: (previous, current)}，信号为字典，没有则为None。
+        每个品种沿主键索引倒序读两行。
+        """
+        if symbols is None:
+            symbols = self.symbols(timeframe)
+        result = {}
+        with self.lock:
+            for symbol in symbols:
+                # 直接读取行，不构造DataFrame
+                rows = self.conn.execute(f'{SELECT} WHERE timeframe = ? AND symbol = ? ORDER BY datetime DESC LIMIT 2',
+                                         (timeframe, symbol)).fetchall()
+                latest = [dict(zip(COLUMNS, row), datetime=pd.Timestamp(row[0])) for row in rows]
+                current = latest[0] if latest else None
+                previous = latest[1] if len(latest) > 1 else None
+                result[symbol] = (previous, current)
+        return result
+
+    def export_dashboard(self, timeframe='5min', path=DASHBOARD_FILE):
+        """导出看板使用的每个品种上一个/当前信号（JSON，原子写入）
+
+        exportedAt为导出时间，看板据此判断数据是否过期。
+        """
+        def to_json(signal):
+            if signal is None:
+                return None
+            return {
+                'type': signal['signal_type'],
+                'price': signal['close'],
+                'time': signal['datetime'].strftime('%Y-%m-%d %H:%M')
+            }
+
+        data = {
+            'exportedAt': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'signals': {
+                symbol: {'lastSignal': to_json(previous), 'currentSignal': to_json(current)}
+                for symbol, (previous, current) in self.previous_current(timeframe).items()
+            }
+        }
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return data
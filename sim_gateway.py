@@ -0,0 +1,356 @@
+import pandas as pd
+import numpy as np
+import argparse
+import itertools
+import os
+import queue
+import tempfile
+import threading
+import time
+from bar_builder import BarBuilder
+from bar_resample import DAY_SESSIONS
+from get_futures_data import symbol_exchange
+from ctpbee.constant import (Event, Exchange, Direction, Status, TickData, OrderData, TradeData,
+                             EVENT_TICK, EVENT_ORDER, EVENT_TRADE, EVENT_INIT_FINISHED)
+
+GATEWAY_NAME = 'SIM'
+# 最小变动价位，用于合成买一卖一
+PRICE_TICK = 1
+# 事件队列积压超过这个数量视为策略处理不过来
+MAX_QUEUE_DEPTH = 1000
+
+class SimMarket:
+    """模拟行情接口，只记录订阅的合约"""
+
+    def __init__(self):
+        self.subscribed = set()
+
+    def subscribe(self, local_symbol):
+        self.subscribed.add(str(local_symbol).split('.')[0])
+        return 0
+
+class SimTrader:
+    """模拟交易接口和撮合：限价单按对手价撮合，全部成交
+
+    买单在卖一价不高于委托价时成交，卖单在买一价不低于委托价时成交。委托时
+    可以立即成交的按对手价成交，挂单在之后的行情中按委托价成交。不考虑排队
+    和部分成交。
+    """
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self.lock = threading.Lock()
+        self.order_ids = itertools.count(1)
+        self.trade_ids = itertools.count(1)
+        self.active = {}  # order_id -> OrderRequest，未成交的挂单
+        self.quotes = {}  # symbol -> (买一, 卖一)
+        self.orders = 0
+        self.trades = 0
+
+    def _order(self, req, order_id, status, traded=0):
+        return OrderData(symbol=req.symbol, exchange=req.exchange, order_id=order_id, type=req.type,
+                         direction=req.direction, offset=req.offset, price=req.price, volume=req.volume,
+                         traded=traded, status=status, gateway_name=GATEWAY_NAME,
+                         time=self.gateway.now().strftime('%H:%M:%S'))
+
+    def _fill(self, req, order_id, price):
+        now = self.gateway.now().strftime('%H:%M:%S')
+        trade = TradeData(symbol=req.symbol, exchange=req.exchange, order_id=order_id,
+                          tradeid=str(next(self.trade_ids)), direction=req.direction, offset=req.offset,
+                          price=price, volume=req.volume, time=now, order_time=now, gateway_name=GATEWAY_NAME)
+        self.trades += 1
+        self.gateway.put(EVENT_ORDER, self._order(req, order_id, Status.ALLTRADED, req.volume))
+        self.gateway.put(EVENT_TRADE, trade)
+
+    def _cross_price(self, req, bid, ask):
+        """可以成交时返回成交价，否则返回None"""
+        if req.direction == Direction.LONG and ask <= req.price:
+            return ask
+        if req.direction == Direction.SHORT and bid >= req.price:
+            return bid
+        return None
+
+    def send_order(self, req, **kwargs):
+        order_id = str(next(self.order_ids))
+        with self.lock:
+            self.orders += 1
+            self.gateway.put(EVENT_ORDER, self._order(req, order_id, Status.NOTTRADED))
+            quote = self.quotes.get(req.symbol)
+            price = self._cross_price(req, *quote) if quote is not None else None
+            if price is not None:
+                self._fill(req, order_id, price)
+            else:
+                self.active[order_id] = req
+        return f'{GATEWAY_NAME}.{order_id}'
+
+    def cancel_order(self, cancel_req, **kwargs):
+        with self.lock:
+            req = self.active.pop(cancel_req.order_id, None)
+            if req is not None:
+                self.gateway.put(EVENT_ORDER, self._order(req, cancel_req.order_id, Status.CANCELLED))
+
+    def on_tick(self, tick):
+        """更新盘口并撮合挂单（挂单按委托价成交）"""
+        with self.lock:
+            self.quotes[tick.symbol] = (tick.bid_price_1, tick.ask_price_1)
+            for order_id, req in list(self.active.items()):
+                if req.symbol == tick.symbol and \
+                        self._cross_price(req, tick.bid_price_1, tick.ask_price_1) is not None:
+                    del self.active[order_id]
+                    self._fill(req, order_id, req.price)
+
+class SimGateway:
+    """本地模拟网关，代替CtpBee驱动CtpbeeApi的回调
+
+    提供策略用到的 add_extension、action.send_order/cancel_order/subscribe、
+    trader、market。回放线程按时间间隔（可加速）把tick放入事件队列，并在交易
+    所一侧撮合挂单；分发线程按顺序把事件交给各策略，与CtpBee一样回调在
+    单独的线程中执行。统计事件吞吐、队列积压和排队延迟。
+    """
+
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self._extensions = {}
+        self.market = SimMarket()
+        self.trader = SimTrader(self)
+        self.events = queue.Queue()
+        self.sim_time = None
+        self.max_depth = 0
+        self.dispatched = 0
+        self.lags = []
+        self.init_delivered = set()  # 已收到EVENT_INIT_FINISHED的策略
+
+    @property
+    def action(self):
+        return self
+
+    def add_extension(self, extension):
+        """与CtpBee.add_extension相同，由策略的init_app注册到_extensions"""
+        self._extensions.pop(extension.extension_name, None)
+        extension.init_app(self)
+        if self._extensions.get(extension.extension_name) is not extension:
+            # ctpbee的注册方式变化时回放不会有任何回调，直接报错
+            raise RuntimeError(f"策略 {extension.extension_name} 的init_app没有注册到模拟网关")
+
+    def send_order(self, req, **kwargs):
+        return self.trader.send_order(req, **kwargs)
+
+    def cancel_order(self, cancel_req, **kwargs):
+        return self.trader.cancel_order(cancel_req, **kwargs)
+
+    def subscribe(self, local_symbol):
+        return self.market.subscribe(local_symbol)
+
+    def now(self):
+        """行情时间（回放中的模拟时间）"""
+        return self.sim_time if self.sim_time is not None else pd.Timestamp.now()
+
+    def put(self, event_type, data):
+        self.events.put((event_type, data, time.perf_counter()))
+        depth = self.events.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def _dispatch(self):
+        stopping = False
+        while True:
+            if stopping:
+                # 回放结束后处理完回调中产生的委托和成交事件再退出
+                try:
+                    item = self.events.get_nowait()
+                except queue.Empty:
+                    return
+            else:
+                item = self.events.get()
+            if item is None:
+                stopping = True
+                continue
+            event_type, data, queued = item
+            event = Event(event_type, data)
+            for extension in list(self._extensions.values()):
+                try:
+                    extension(event)
+                    if event_type == EVENT_INIT_FINISHED:
+                        self.init_delivered.add(extension.extension_name)
+                except Exception as e:
+                    print(f"策略 {extension.extension_name} 处理{event_type}事件出错: {e}")
+            self.lags.append(time.perf_counter() - queued)
+            self.dispatched += 1
+
+    def _wait_init(self, timeout=10):
+        """等待初始化完成事件分发到所有策略"""
+        expected = set(self._extensions)
+        deadline = time.monotonic() + timeout
+        while not expected <= self.init_delivered:
+            if time.monotonic() > deadline:
+                self.events.put(None)
+                raise RuntimeError(f"策略没有收到初始化完成事件: {sorted(expected - self.init_delivered)}")
+            time.sleep(0.01)
+
+    def replay(self, ticks):
+        """按行情时间间隔/speed回放tick（speed为0时不等待），返回统计结果
+
+        所有策略都收到初始化完成事件后才开始回放，否则抛出RuntimeError。
+        """
+        if not self._extensions:
+            raise RuntimeError("模拟网关没有注册任何策略")
+        dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        dispatcher.start()
+        self.put(EVENT_INIT_FINISHED, True)
+        self._wait_init()
+
+        start = time.perf_counter()
+        first = None
+        offered = 0
+        for tick in ticks:
+            if first is None:
+                first = tick.datetime
+            if self.speed:
+                due = start + (tick.datetime - first).total_seconds() / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.sim_time = pd.Timestamp(tick.datetime)
+            self.trader.on_tick(tick)
+            self.put(EVENT_TICK, tick)
+            offered += 1
+        offer_elapsed = time.perf_counter() - start
+
+        self.events.put(None)
+        dispatcher.join()
+        elapsed = time.perf_counter() - start
+        lags = np.array(self.lags) if self.lags else np.zeros(1)
+        return {
+            'speed': self.speed,
+            'ticks': offered,
+            'events': self.dispatched,
+            'offered_per_second': offered / offer_elapsed if offer_elapsed else np.nan,
+            'events_per_second': self.dispatched / elapsed if elapsed else np.nan,
+            'max_queue_depth': self.max_depth,
+            'lag_p50_ms': float(np.percentile(lags, 50) * 1000),
+            'lag_p99_ms': float(np.percentile(lags, 99) * 1000),
+            'orders': self.trader.orders,
+            'trades': self.trader.trades
+        }
+
+def session_times(day, interval=0.5):
+    """某个交易日日盘的tick时间（每interval秒一个）"""
+    day = pd.Timestamp(day).normalize()
+    times = [pd.date_range(day + pd.Timedelta(minutes=start), day + pd.Timedelta(minutes=end),
+                           freq=pd.Timedelta(seconds=interval), inclusive='left')
+             for start, end in DAY_SESSIONS]
+    return times[0].append(times[1:])
+
+def synthetic_ticks(symbols, days, interval=0.5, start_price=3000, seed=0, exchange=None):
+    """合成随机游走的tick（按时间排序，多合约交错）
+
+    exchange为None时按品种代码取合约所在的交易所。
+    """
+    rng = np.random.default_rng(seed)
+    times = session_times(days[0], interval)
+    for day in days[1:]:
+        times = times.append(session_times(day, interval))
+
+    ticks = []
+    for symbol in symbols:
+        prices = np.round(start_price + np.cumsum(rng.standard_normal(len(times)) * 2))
+        volumes = np.cumsum(rng.integers(0, 10, len(times)))
+        for i, (t, price) in enumerate(zip(times, prices)):
+            ticks.append((t, symbol, float(price), float(volumes[i])))
+    ticks.sort(key=lambda tick: tick[0])
+    exchanges = {symbol: exchange or Exchange(symbol_exchange(symbol) or 'SHFE') for symbol in symbols}
+    return [TickData(symbol=symbol, exchange=exchanges[symbol], datetime=t.to_pydatetime(), last_price=price, volume=volume,
+                     bid_price_1=price - PRICE_TICK, ask_price_1=price + PRICE_TICK, gateway_name=GATEWAY_NAME)
+            for t, symbol, price, volume in ticks]
+
+def load_ticks(path, exchange=Exchange.SHFE):
+    """读取录制的tick（CSV：symbol, datetime, last_price, volume, bid_price_1, ask_price_1）"""
+    df = pd.read_csv(path, parse_dates=['datetime']).sort_values('datetime', kind='stable')
+    return [TickData(symbol=row.symbol, exchange=exchange, datetime=row.datetime.to_pydatetime(),
+                     last_price=float(row.last_price), volume=float(row.volume),
+                     bid_price_1=float(row.bid_price_1), ask_price_1=float(row.ask_price_1),
+                     gateway_name=GATEWAY_NAME)
+            for row in df.itertuples(index=False)]
+
+def warmup_bars(ticks, minutes=5):
+    """把预热用的tick合成为K线，返回 {symbol: DataFrame}"""
+    builder = BarBuilder(periods=(minutes,))
+    bars = {}
+    for tick in ticks:
+        for _, bar in builder.update_tick(tick.symbol, tick.datetime, tick.last_price, tick.volume):
+            bars.setdefault(tick.symbol, []).append(bar)
+    for symbol, _, bar in builder.close_due(pd.Timestamp.max):
+        bars.setdefault(symbol, []).append(bar)
+    return {symbol: pd.DataFrame(rows) for symbol, rows in bars.items()}
+
+def load_test(make_api, ticks, speeds, max_depth=MAX_QUEUE_DEPTH):
+    """按不同加速倍数回放，找出队列不积压时策略能承受的最大事件速率
+
+    make_api()每次返回一个新的策略实例。队列积压不超过max_depth视为能承受。
+    """
+    results = []
+    for speed in speeds:
+        gateway = SimGateway(speed=speed)
+        api = make_api()
+        gateway.add_extension(api)
+        result = gateway.replay(ticks)
+        if getattr(api, 'inited', True) is False:
+            raise RuntimeError(f"策略 {api.extension_name} 收到初始化完成事件但没有执行on_init")
+        result['sustained'] = result['max_queue_depth'] <= max_depth
+        results.append(result)
+        print(f"加速{speed}倍: 输入{result['offered_per_second']:.0f}笔/秒 处理{result['events_per_second']:.0f}事件/秒 "
+              f"最大积压{result['max_queue_depth']} 延迟p99 {result['lag_p99_ms']:.1f}ms "
+              f"委托{result['orders']} 成交{result['trades']}")
+
+    report = pd.DataFrame(results)
+    sustained = report[report['sustained']]
+    if not sustained.empty:
+        best = sustained.loc[sustained['events_per_second'].idxmax()]
+        print(f"不积压时最高处理 {best['events_per_second']:.0f} 事件/秒（加速{best['speed']}倍）")
+    else:
+        print("所有加速倍数下事件队列都出现积压")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟网关回放tick，压测实盘策略')
+    parser.add_argument('--ticks', help='录制的tick CSV，默认合成随机行情')
+    parser.add_argument('--symbols', nargs='*', default=None, help='合成行情的合约，默认实盘监控的全部合约')
+    parser.add_argument('--days', nargs='*', default=['2025-03-03', '2025-03-04'],
+                        help='合成行情的交易日，第一天用于预热指标')
+    parser.add_argument('--speeds', nargs='*', type=float, default=[100, 1000, 0],
+                        help='加速倍数，0为不等待尽快回放')
+    args = parser.parse_args()
+
+    from live_trading import LiveTradingApi
+
+    if args.ticks:
+        ticks = load_ticks(args.ticks)
+        warmup, replay = [], ticks
+    else:
+        from get_futures_data import get_all_futures_symbols
+        symbols = args.symbols or get_all_futures_symbols()
+        ticks = synthetic_ticks(symbols, args.days)
+        first_day = pd.Timestamp(args.days[0]).normalize() + pd.Timedelta(days=1)
+        warmup = [tick for tick in ticks if tick.datetime < first_day]
+        replay = [tick for tick in ticks if tick.datetime >= first_day]
+    history = warmup_bars(warmup)
+    print(f"回放{len(replay)}笔tick，预热K线{sum(len(df) for df in history.values())}根")
+
+    # 信号库和信号日志写到临时目录，不影响实盘数据
+    workdir = tempfile.mkdtemp(prefix='sim_gateway_')
+    os.chdir(workdir)
+
+    empty = pd.DataFrame({'datetime': pd.Series(dtype='datetime64[ns]'), 'close': pd.Series(dtype=float)})
+
+    def make_api():
+        api = LiveTradingApi('sim_trading_api')
+        # 没有预热K线的合约在回放中逐步形成指标
+        for symbol in {tick.symbol for tick in replay}:
+            api.engine.seed(symbol, history.get(symbol, empty))
+        return api
+
+    report = load_test(make_api, replay, args.speeds)
+    print(report.to_string(index=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import os
+import json
+import time
+from datetime import datetime
+
+SNAPSHOT_FILE = 'live_data/state_snapshot.json'
+# 快照格式版本，格式变化时加一，旧版本的快照不再载入
+SNAPSHOT_VERSION = 1
+
+def save_snapshot(engine_state, positions, consumed=None, path=SNAPSHOT_FILE):
+    """原子写入实盘状态快照：指标引擎状态、每个合约最后处理的K线、持仓、已开仓的信号时间"""
+    last_bars = {symbol: data['state']['datetime'] for symbol, data in engine_state.items()}
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'saved_at': datetime.now().isoformat(),
+        'engine': engine_state,
+        'last_bars': last_bars,
+        'positions': positions,
+        'consumed': consumed or {}
+    }
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'), default=float)
+        f.flush()
+        # 持仓不能因为断电丢失，替换前先落盘
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return snapshot
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """读取快照，没有、损坏或版本不符时返回None"""
+    start = time.perf_counter()
+    try:
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        if os.path.exists(path):
+            print(f"读取状态快照失败: {e}")
+        return None
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        print(f"状态快照版本 {snapshot.get('version')} 与当前版本 {SNAPSHOT_VERSION} 不符，忽略")
+        return None
+    print(f"载入状态快照: {len(snapshot['engine'])}个合约 {len(snapshot['positions'])}个持仓 "
+          f"保存于{snapshot['saved_at']} 耗时{(time.perf_counter() - start) * 1000:.1f}ms")
+    return snapshot
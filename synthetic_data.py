@@ -0,0 +1,51 @@
+import pandas as pd
+import numpy as np
+from bar_resample import NIGHT_SESSIONS, DAY_SESSIONS
+
+def session_bar_offsets(minutes):
+    """一个交易日内夜盘和日盘各K线的结束时间（距当天0点的分钟数）
+
+    按交易分钟计数切分K线，跨休息时段的K线在休息后继续计数，与期货行情软件的
+    30分钟K线口径一致（如10:45、11:15、13:45）。
+    """
+    offsets = []
+    for sessions in (NIGHT_SESSIONS, DAY_SESSIONS):
+        trading_minutes = np.concatenate([np.arange(start + 1, end + 1) for start, end in sessions])
+        closes = np.arange(minutes, len(trading_minutes) + 1, minutes) - 1
+        if len(trading_minutes) % minutes:
+            closes = np.append(closes, len(trading_minutes) - 1)
+        offsets.append(trading_minutes[closes])
+    return offsets
+
+def generate_bars(rows, minutes=1, start='2020-01-02', start_price=3000.0, seed=0):
+    """生成带夜盘和午休间隔的模拟期货K线
+
+    返回与ak.futures_zh_minute_sina相同列的DataFrame：datetime, open, high, low, close, volume, hold。
+    """
+    rng = np.random.default_rng(seed)
+    night, day = session_bar_offsets(minutes)
+    days_needed = -(-rows // (len(night) + len(day)))
+    # 夜盘属于下一个交易日，挂在前一个工作日晚上
+    days = pd.bdate_range(start, periods=days_needed + 1).to_numpy(dtype='datetime64[m]')
+    times = np.concatenate([
+        days[:-1, None] + night[None, :].astype('timedelta64[m]'),
+        days[1:, None] + day[None, :].astype('timedelta64[m]')
+    ], axis=1).ravel()[:rows]
+
+    # 对数收益率随机游走，波动随周期放大
+    returns = rng.normal(0, 0.0008 * np.sqrt(minutes), rows)
+    close = np.round(start_price * np.exp(np.cumsum(returns)))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    spread = np.abs(rng.normal(0, start_price * 0.0005 * np.sqrt(minutes), (2, rows)))
+    high = np.round(np.maximum(open_, close) + spread[0])
+    low = np.round(np.minimum(open_, close) - spread[1])
+
+    return pd.DataFrame({
+        'datetime': times.astype('datetime64[ns]'),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': rng.integers(1, 500, rows) * minutes,
+        'hold': 200000 + np.cumsum(rng.integers(-50, 51, rows))
+    })
@@ -0,0 +1,93 @@
+import pandas as pd
+import numpy as np
+
+# 每个开平仓回合一行
+COLUMNS = [
+    ('symbol', np.int16),          # 品种编号，对应TradeLedger.symbols
+    ('side', np.int8),             # 1做多，-1做空
+    ('entry_time', 'datetime64[ns]'),
+    ('entry_price', np.float64),
+    ('exit_time', 'datetime64[ns]'),
+    ('exit_price', np.float64),
+    ('size', np.int32),
+    ('profit', np.float64),
+]
+
+class TradeLedger:
+    """按列存储的成交记录，预分配NumPy数组，容量不足时倍增"""
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.symbols = []
+        self._symbol_codes = {}
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS}
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = max(1, 2 * len(self.columns['profit']))
+        for name, values in self.columns.items():
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self.columns[name] = grown
+
+    def _symbol_code(self, symbol):
+        if symbol not in self._symbol_codes:
+            self._symbol_codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self._symbol_codes[symbol]
+
+    def append(self, symbol, side, entry_time, entry_price, exit_time, exit_price, size, profit):
+        """记录一笔完整的开平仓交易"""
+        if self.size == len(self.columns['profit']):
+            self._grow()
+        i = self.size
+        self.columns['symbol'][i] = self._symbol_code(symbol)
+        self.columns['side'][i] = side
+        self.columns['entry_time'][i] = np.datetime64(pd.Timestamp(entry_time))
+        self.columns['entry_price'][i] = entry_price
+        self.columns['exit_time'][i] = np.datetime64(pd.Timestamp(exit_time))
+        self.columns['exit_price'][i] = exit_price
+        self.columns['size'][i] = size
+        self.columns['profit'][i] = profit
+        self.size += 1
+
+    def view(self, name):
+        """返回某一列已使用部分的视图（不复制）"""
+        return self.columns[name][:self.size]
+
+    def to_frame(self):
+        """转换为DataFrame，数值列直接引用底层数组"""
+        side = self.view('side')
+        data = {
+            'symbol': pd.Categorical.from_codes(self.view('symbol'), categories=self.symbols),
+            'type': pd.Categorical.from_codes((side < 0).astype(np.int8), categories=['买入', '卖出']),
+        }
+        data.update({name: self.view(name) for name, _ in COLUMNS if name != 'symbol'})
+        return pd.DataFrame(data, copy=False)
+
+    def stats(self, initial_capital=0):
+        """汇总统计：胜率、盈亏比、最大回撤等"""
+        profit = self.view('profit')
+        gross_profit = profit[profit > 0].sum()
+        gross_loss = -profit[profit < 0].sum()
+
+        equity = initial_capital + np.cumsum(profit)
+        peak = np.maximum(np.maximum.accumulate(equity), initial_capital) if self.size else equity
+        drawdown = peak - equity
+        max_drawdown = drawdown.max() if self.size else 0.0
+        max_drawdown_pct = (drawdown / peak).max() * 100 if self.size and initial_capital > 0 else 0.0
+
+        if gross_loss > 0:
+            profit_factor = gross_profit / gross_loss
+        else:
+            profit_factor = np.inf if gross_profit > 0 else 0.0
+
+        return {
+            'win_rate': (profit > 0).mean() * 100 if self.size else 0.0,
+            'profit_factor': profit_factor,
+            'max_drawdown': max_drawdown,
+            'max_drawdown_pct': max_drawdown_pct,
+            'avg_profit': profit.mean() if self.size else 0.0
+        }
@@ -0,0 +1,82 @@
+import pandas as pd
+import argparse
+import concurrent.futures
+from backtest import Backtest, bar_store
+from trend_strategy import trend_signal_history
+
+def exit_bars(symbol, signals):
+    """入场和止盈使用的K线：1分钟K线覆盖全部信号时用1分钟，否则用5分钟
+
+    改用5分钟K线时打印原因，这时的结果与用1分钟K线的backtest.py不可比。
+    """
+    min_data = bar_store.load(symbol, '1min')
+    if not min_data.empty and (signals.empty or min_data['datetime'].iloc[0] <= signals['datetime'].iloc[0]):
+        return min_data, '1min'
+    if min_data.empty:
+        print(f"{symbol} 没有1分钟K线，改用5分钟K线判断入场和止盈")
+    elif not signals.empty:
+        print(f"{symbol} 1分钟K线从 {min_data['datetime'].iloc[0]} 开始，晚于第一个信号 "
+              f"{signals['datetime'].iloc[0]}，改用5分钟K线判断入场和止盈")
+    return bar_store.load(symbol, '5min'), '5min'
+
+def backtest_trend(symbol, take_profit=None, initial_capital=100000):
+    """回测单个品种的顺大顺小策略
+
+    止盈点数默认与Backtest相同（按品种配置，未配置的用default_take_profit_point），
+    take_profit指定时覆盖。
+    """
+    signals = trend_signal_history(bar_store.load(symbol, '30min'), bar_store.load(symbol, '5min'), symbol)
+    bars, timeframe = exit_bars(symbol, signals)
+    if bars.empty:
+        raise ValueError(f"{symbol} 没有K线数据")
+    # 入场K线之后还要有K线才能判断止盈，最后两根K线上的信号不交易
+    if len(bars) < 2:
+        raise ValueError(f"{symbol} K线数量不足")
+    signals = signals[signals['datetime'] < pd.Timestamp(bars['datetime'].iloc[-2])]
+
+    backtest = Backtest(initial_capital)
+    if take_profit is not None:
+        backtest.take_profit_points[symbol] = take_profit
+    report = backtest.run_signals(symbol, signals, bars)
+    report['exit_timeframe'] = timeframe
+    report['take_profit'] = backtest.take_profit_points.get(symbol, backtest.default_take_profit_point)
+    return report
+
+def run_trend_backtests(symbols, take_profit=None, max_workers=None):
+    """用进程池回测多个品种，返回 {symbol: report}，按传入的品种顺序排列"""
+    reports = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(backtest_trend, symbol, take_profit): symbol for symbol in symbols}
+        for future in concurrent.futures.as_completed(futures):
+            symbol = futures[future]
+            try:
+                reports[symbol] = future.result()
+            except Exception as e:
+                print(f"回测 {symbol} 时出错: {e}")
+    return {symbol: reports[symbol] for symbol in symbols if symbol in reports}
+
+def main():
+    parser = argparse.ArgumentParser(description='顺大顺小策略历史回测')
+    parser.add_argument('symbols', nargs='*', help='默认回测本地有5分钟K线的所有品种')
+    parser.add_argument('--take-profit', type=float, default=None, help='所有品种统一的止盈点数，默认使用Backtest的按品种配置')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    symbols = args.symbols or bar_store.symbols('5min')
+    reports = run_trend_backtests(symbols, args.take_profit, args.workers)
+
+    summary = pd.DataFrame([{
+        'symbol': symbol,
+        'total_trades': report['total_trades'],
+        'total_profit': report['total_profit'],
+        'profit_pct': report['profit_pct'],
+        'win_rate': report['win_rate'],
+        'max_drawdown': report['max_drawdown'],
+        'take_profit': report['take_profit'],
+        'exit_timeframe': report['exit_timeframe']
+    } for symbol, report in reports.items()])
+    print(summary.to_string(index=False))
+    summary.to_csv('trend_backtest_summary.csv', index=False)
+
+if __name__ == "__main__":
+    main()
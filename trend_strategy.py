@@ -1,45 +1,50 @@
 import pandas as pd
 import numpy as np
-import talib
-import os
 from datetime import datetime
-from get_futures_data import get_30min_data, get_5min_data, get_all_futures_symbols
+from indicators import compute
+from signal_journal import signal_journal
+from get_futures_data import get_1min_data, get_all_futures_symbols, needs_seed, process_symbol, update_from_1min, bar_store
 
-def calculate_trend_signals(df, timeframe='30min'):
-    """计算EMA8和EMA21趋势信号"""
-    # 计算EMA
-    df['EMA8'] = talib.EMA(df['close'], timeperiod=8)
-    df['EMA21'] = talib.EMA(df['close'], timeperiod=21)
-    
-    # 计算趋势
-    df['trend'] = np.where(df['EMA8'] > df['EMA21'], 1, -1)  # 1表示多头趋势，-1表示空头趋势
-    df['trend_change'] = df['trend'].diff()
-    
-    # 计算斜率和角度（用于过滤信号）
-    df['EMA8_slope'] = df['EMA8'].diff(3) / 3
-    df['EMA21_slope'] = df['EMA21'].diff(3) / 3
-    df['angle'] = np.degrees(np.arctan2(df['EMA8_slope'] - df['EMA21_slope'], 1))
-    
-    return df
+# 计算趋势使用的K线数量
+TREND_HISTORY_BARS = 1000
+
+def calculate_trend_signals(df, timeframe='30min', symbol=None):
+    """计算EMA8和EMA21趋势信号，返回附加了指标列的新DataFrame"""
+    columns = compute(df, ['EMA8', 'EMA21', 'cross', 'cross_change', 'EMA8_slope', 'EMA21_slope', 'angle_degrees'],
+                      symbol, timeframe)
+    return df.assign(
+        EMA8=columns['EMA8'].copy(),
+        EMA21=columns['EMA21'].copy(),
+        trend=columns['cross'].copy(),  # 1表示多头趋势，-1表示空头趋势
+        trend_change=columns['cross_change'].copy(),
+        # 斜率和角度（用于过滤信号）
+        EMA8_slope=columns['EMA8_slope'].copy(),
+        EMA21_slope=columns['EMA21_slope'].copy(),
+        angle=columns['angle_degrees'].copy()
+    )
 
 def get_current_trend(symbol):
     """获取当前30分钟和5分钟趋势"""
-    # 获取30分钟数据
-    df_30min = get_30min_data(symbol)
-    if df_30min is None or df_30min.empty:
-        return None, None
+    # 只获取1分钟数据，合成5分钟和30分钟K线后与本地历史合并
+    if needs_seed(symbol):
+        process_symbol(symbol)
+    else:
+        df_1min = get_1min_data(symbol)
+        if df_1min is None or df_1min.empty:
+            return None, None
+        update_from_1min(symbol, df_1min)
     
-    # 获取5分钟数据
-    df_5min = get_5min_data(symbol)
-    if df_5min is None or df_5min.empty:
+    df_30min = bar_store.load(symbol, '30min', tail=TREND_HISTORY_BARS)
+    df_5min = bar_store.load(symbol, '5min', tail=TREND_HISTORY_BARS)
+    if df_30min.empty or df_5min.empty:
         return None, None
     
     # 计算30分钟趋势
-    df_30min = calculate_trend_signals(df_30min, '30min')
+    df_30min = calculate_trend_signals(df_30min, '30min', symbol)
     current_30min_trend = df_30min.iloc[-1]['trend']
     
     # 计算5分钟趋势
-    df_5min = calculate_trend_signals(df_5min, '5min')
+    df_5min = calculate_trend_signals(df_5min, '5min', symbol)
     current_5min_trend = df_5min.iloc[-1]['trend']
     last_5min_trend_change = df_5min.iloc[-1]['trend_change']
     
@@ -87,30 +92,44 @@ def check_trading_signal(symbol_trends):
     
     return signal
 
+def trend_signal_history(df_30min, df_5min, symbol=None):
+    """按历史K线一次性计算顺大顺小信号，条件与check_trading_signal相同
+
+    K线时间为结束时间。每根5分钟K线只使用在它收盘时已经收盘的30分钟K线的
+    趋势（向后as-of连接，同一时刻收盘的30分钟K线可以使用），不引入未来数据。
+    EMA21尚未形成的K线不产生信号。返回 datetime, close, signal(1做多/-1做空)。
+    """
+    df_30min = calculate_trend_signals(df_30min, '30min', symbol)
+    df_5min = calculate_trend_signals(df_5min, '5min', symbol)
+    for df in (df_30min, df_5min):
+        df['datetime'] = pd.to_datetime(df['datetime']).astype('datetime64[ns]')
+
+    trend_30min = df_30min.loc[df_30min['EMA21'].notna(), ['datetime', 'trend']].rename(columns={'trend': 'trend_30min'})
+    merged = pd.merge_asof(df_5min.sort_values('datetime', kind='stable'), trend_30min.sort_values('datetime', kind='stable'),
+                           on='datetime', direction='backward', allow_exact_matches=True)
+
+    # 上一根5分钟K线的EMA21也已形成，趋势变化才有效
+    ready = merged['EMA21'].notna() & merged['EMA21'].shift(1).notna()
+    long = ready & (merged['trend_30min'] == 1) & (merged['trend'] == 1) & (merged['trend_change'] == 2)
+    short = ready & (merged['trend_30min'] == -1) & (merged['trend'] == -1) & (merged['trend_change'] == -2)
+
+    signals = merged.loc[long | short, ['datetime', 'close']].reset_index(drop=True)
+    signals['signal'] = np.where(long[long | short].to_numpy(), 1, -1)
+    return signals
+
 def save_signal(signal, symbol):
-    """保存交易信号到CSV文件"""
+    """记录交易信号到信号日志（批量写入 signals/trend_signals_YYYYMMDD.jsonl）"""
     if not signal:
         return
     
-    # 确保signals目录存在
-    if not os.path.exists('signals'):
-        os.makedirs('signals')
-    
-    # 创建信号DataFrame
-    signal_df = pd.DataFrame([{
+    signal_journal.write({
         'symbol': symbol,
         'datetime': signal['datetime'],
         'type': signal['type'],
         'price': signal['price'],
-        'reason': signal['reason']
-    }])
-    
-    # 保存到CSV
-    filename = f'signals/trend_signals_{datetime.now().strftime("%Y%m%d")}.csv'
-    mode = 'a' if os.path.exists(filename) else 'w'
-    header = not os.path.exists(filename)
-    signal_df.to_csv(filename, mode=mode, header=header, index=False, encoding='utf-8-sig')
-    print(f"信号已保存到: {filename}")
+        'reason': signal['reason'],
+        'source': 'trend_strategy'
+    })
 
 def main():
     """主函数：获取所有合约的趋势信号"""
@@ -140,6 +159,9 @@ def main():
                 print(f"获取趋势数据失败")
         except Exception as e:
             print(f"处理合约 {symbol} 时出错: {e}")
+    
+    signal_journal.flush()
+    print(f"信号已保存到: {signal_journal.path(datetime.now().strftime('%Y%m%d'))}")
         
 if __name__ == "__main__":
     main() 
\ No newline at end of file
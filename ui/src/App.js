@@ -1,77 +1,38 @@
 import React, { useState, useEffect } from 'react';
-import { Layout, Row, Col, Typography } from 'antd';
+import { Layout, Row, Col, Typography, Alert } from 'antd';
 import SignalCard from './components/SignalCard';
 import './App.css';
 
 const { Header, Content } = Layout;
 const { Text } = Typography;
 
-// 模拟数据
-const mockData = {
-  'RB2510': {
-    name: '螺纹钢',
-    lastSignal: { type: '金叉', price: 3500, time: '2024-04-07 10:00' },
-    currentSignal: { type: '死叉', price: 3480, time: '2024-04-07 10:05' }
-  },
-  'MA2505': {
-    name: '甲醇',
-    lastSignal: { type: '死叉', price: 4200, time: '2024-04-07 10:00' },
-    currentSignal: { type: '金叉', price: 4220, time: '2024-04-07 10:05' }
-  },
-  'SA2505': {
-    name: '纯碱',
-    lastSignal: { type: '金叉', price: 2800, time: '2024-04-07 10:00' },
-    currentSignal: { type: '金叉', price: 2820, time: '2024-04-07 10:05' }
-  },
-  'RM2509': {
-    name: '菜粕',
-    lastSignal: { type: '死叉', price: 3100, time: '2024-04-07 10:00' },
-    currentSignal: { type: '死叉', price: 3080, time: '2024-04-07 10:05' }
-  },
-  'FU2507': {
-    name: '燃料油',
-    lastSignal: { type: '金叉', price: 2900, time: '2024-04-07 10:00' },
-    currentSignal: { type: '金叉', price: 2920, time: '2024-04-07 10:05' }
-  },
-  'FG2505': {
-    name: '玻璃',
-    lastSignal: { type: '死叉', price: 1800, time: '2024-04-07 10:00' },
-    currentSignal: { type: '死叉', price: 1780, time: '2024-04-07 10:05' }
-  },
-  'V2505': {
-    name: 'PVC',
-    lastSignal: { type: '金叉', price: 6200, time: '2024-04-07 10:00' },
-    currentSignal: { type: '金叉', price: 6220, time: '2024-04-07 10:05' }
-  },
-  'HC2510': {
-    name: '热轧卷板',
-    lastSignal: { type: '死叉', price: 3800, time: '2024-04-07 10:00' },
-    currentSignal: { type: '死叉', price: 3780, time: '2024-04-07 10:05' }
-  },
-  'Y2509': {
-    name: '豆油',
-    lastSignal: { type: '金叉', price: 7500, time: '2024-04-07 10:00' },
-    currentSignal: { type: '金叉', price: 7520, time: '2024-04-07 10:05' }
-  },
-  'BU2506': {
-    name: '沥青',
-    lastSignal: { type: '死叉', price: 3600, time: '2024-04-07 10:00' },
-    currentSignal: { type: '死叉', price: 3580, time: '2024-04-07 10:05' }
-  },
-  'SP2505': {
-    name: '纸浆',
-    lastSignal: null,
-    currentSignal: null
-  },
-  'AL2505': {
-    name: '铝',
-    lastSignal: { type: '金叉', price: 18500, time: '2024-04-07 10:00' },
-    currentSignal: { type: '金叉', price: 18520, time: '2024-04-07 10:05' }
-  }
+// 品种名称，没有的显示合约代码
+const SYMBOL_NAMES = {
+  'RB2510': '螺纹钢',
+  'MA2505': '甲醇',
+  'SA2505': '纯碱',
+  'RM2509': '菜粕',
+  'FU2507': '燃料油',
+  'FG2505': '玻璃',
+  'V2505': 'PVC',
+  'HC2510': '热轧卷板',
+  'Y2509': '豆油',
+  'BU2506': '沥青',
+  'SP2505': '纸浆',
+  'AL2505': '铝'
 };
 
+// 信号计算程序导出的每个品种上一个/当前信号
+const SIGNALS_URL = '/signals.json';
+// 导出时间超过这个分钟数视为数据过期
+const STALE_MINUTES = 10;
+
 function App() {
   const [currentTime, setCurrentTime] = useState(new Date());
+  // 只显示导出文件中的信号，读取失败时保留上一次成功读取的数据
+  const [signals, setSignals] = useState({});
+  const [exportedAt, setExportedAt] = useState(null);
+  const [error, setError] = useState(null);
 
   useEffect(() => {
     const timer = setInterval(() => {
@@ -81,6 +42,27 @@ function App() {
     return () => clearInterval(timer);
   }, []);
 
+  useEffect(() => {
+    const loadSignals = () => {
+      fetch(SIGNALS_URL, { cache: 'no-store' })
+        .then((response) => (response.ok ? response.json() : Promise.reject(response.status)))
+        .then((data) => {
+          const merged = {};
+          Object.entries(data.signals || {}).forEach(([symbol, item]) => {
+            merged[symbol] = { name: SYMBOL_NAMES[symbol] || symbol, ...item };
+          });
+          setSignals(merged);
+          setExportedAt(data.exportedAt || null);
+          setError(null);
+        })
+        .catch((reason) => setError(`读取信号文件失败: ${reason}`));
+    };
+
+    loadSignals();
+    const timer = setInterval(loadSignals, 60 * 1000);
+    return () => clearInterval(timer);
+  }, []);
+
   const formatTime = (date) => {
     return date.toLocaleString('zh-CN', {
       year: 'numeric',
@@ -93,6 +75,11 @@ function App() {
     });
   };
 
+  // 导出时间为本地时间 'YYYY-MM-DD HH:mm:ss'
+  const exportedTime = exportedAt ? new Date(exportedAt.replace(' ', 'T')) : null;
+  const stale = exportedTime !== null && currentTime - exportedTime > STALE_MINUTES * 60 * 1000;
+  const exportInfo = exportedAt ? `信号导出于 ${exportedAt}` : '尚未读取到信号';
+
   return (
     <Layout className="layout">
       <Header className="header">
@@ -102,8 +89,19 @@ function App() {
         </div>
       </Header>
       <Content className="content">
+        {error && (
+          <Alert className="status-alert" type="error" showIcon message={error}
+                 description={exportedAt ? `以下为最后一次成功读取的数据，${exportInfo}` : '尚未读取到任何信号'} />
+        )}
+        {!error && stale && (
+          <Alert className="status-alert" type="warning" showIcon
+                 message={`信号数据已超过${STALE_MINUTES}分钟未更新`} description={exportInfo} />
+        )}
+        {!error && !stale && exportedAt && (
+          <div className="status-alert"><Text type="secondary">{exportInfo}</Text></div>
+        )}
         <Row gutter={[16, 16]}>
-          {Object.entries(mockData).map(([symbol, data]) => (
+          {Object.entries(signals).map(([symbol, data]) => (
             <Col span={6} key={symbol}>
               <SignalCard symbol={symbol} name={data.name} data={data} />
             </Col>